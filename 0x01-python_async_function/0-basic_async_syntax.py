@@ -5,13 +5,23 @@ COntains coroutine wait_random
 
 import asyncio
 import random
+from typing import Optional
 
 
-async def wait_random(max_delay: int = 10) -> float:
+get_timer_wheel = __import__('5-timer_wheel').get_timer_wheel
+
+
+async def wait_random(max_delay: int = 10,
+                      resolution: Optional[float] = None) -> float:
     """
     Waits for a random delay between 0 and max_delay
-    and eventually returns it
+    and eventually returns it.
+    With a resolution, the sleep is coalesced with others on the
+    loop's timer wheel and may last up to resolution seconds longer
     """
     wait_time = max_delay * random.random()
-    await asyncio.sleep(wait_time)
+    if resolution is None:
+        await asyncio.sleep(wait_time)
+    else:
+        await get_timer_wheel(resolution).sleep(wait_time)
     return wait_time
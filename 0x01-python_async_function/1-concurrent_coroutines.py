@@ -2,16 +2,102 @@
 '''Task 1's module.
 '''
 import asyncio
-from typing import List
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+)
 
 
 wait_random = __import__('0-basic_async_syntax').wait_random
 
+SPAWN_BATCH = 1024
 
-async def wait_n(n: int, max_delay: int) -> List[float]:
+
+async def wait_n(n: int, max_delay: int,
+                 max_concurrency: Optional[int] = None,
+                 resolution: Optional[float] = None) -> List[float]:
     '''Executes wait_random n times.
+    With `max_concurrency`, at most that many run at once, see
+    run_bounded. With `resolution`, sleeps share the loop's timer
+    wheel, see wait_random.
     '''
+    if max_concurrency is not None:
+        return await run_bounded(lambda: wait_random(max_delay, resolution),
+                                 n, max_concurrency)
     wait_times = await asyncio.gather(
-        *tuple(map(lambda _: wait_random(max_delay), range(n)))
+        *tuple(map(lambda _: wait_random(max_delay, resolution), range(n)))
     )
     return sorted(wait_times)
+
+
+async def run_bounded(spawn: Callable[[], Awaitable[float]], n: int,
+                      max_concurrency: int) -> List[float]:
+    '''Awaits `spawn()` n times, at most max_concurrency at once, and
+    returns the sorted results.
+    A fixed pool of workers pulls the work from a shared iterator, so
+    memory and the loop's timer heap stay bounded by max_concurrency
+    rather than n. When a call fails, the other workers are cancelled
+    and the error is raised.
+    '''
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be >= 1')
+    work = iter(range(n))
+    wait_times: List[float] = []
+
+    async def worker() -> None:
+        '''Awaits spawned work until none is left.
+        '''
+        for _ in work:
+            wait_times.append(await spawn())
+
+    workers = [asyncio.ensure_future(worker())
+               for _ in range(min(n, max_concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    wait_times.sort()
+    return wait_times
+
+
+async def as_completed(tasks: Iterable[asyncio.Future]) -> AsyncIterator[Any]:
+    '''Yields the results of tasks as they complete.
+    Tasks are pulled from `tasks` in batches of SPAWN_BATCH, yielding
+    to the event loop in between so that early results come out before
+    the last task is started. Finished tasks are dropped at once, and
+    the pending ones are cancelled if the caller stops early.
+    '''
+    done: asyncio.Queue = asyncio.Queue()
+    pending = set()
+    try:
+        for spawned, task in enumerate(tasks, 1):
+            pending.add(task)
+            task.add_done_callback(done.put_nowait)
+            if spawned % SPAWN_BATCH == 0:
+                await asyncio.sleep(0)
+                while not done.empty():
+                    task = done.get_nowait()
+                    pending.discard(task)
+                    yield task.result()
+        while pending:
+            task = await done.get()
+            pending.discard(task)
+            yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def wait_n_as_completed(n: int, max_delay: int) -> AsyncIterator[float]:
+    '''Executes wait_random n times, yielding each delay as soon as
+    it has elapsed, i.e. in completion order. That is ascending except
+    for delays closer than the time it took to start the coroutines.
+    '''
+    coroutines = (wait_random(max_delay) for _ in range(n))
+    return as_completed(map(asyncio.ensure_future, coroutines))
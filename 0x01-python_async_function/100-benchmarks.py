@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+'''Benchmarks for the async functions of this project.
+Run `./100-benchmarks.py <name> [--n N]`, or without a name to run
+them all with their default n.
+'''
+import argparse
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+concurrent_coroutines = __import__('1-concurrent_coroutines')
+tasks = __import__('4-tasks')
+wait_n = concurrent_coroutines.wait_n
+wait_n_as_completed = concurrent_coroutines.wait_n_as_completed
+task_wait_n = tasks.task_wait_n
+task_wait_n_as_completed = tasks.task_wait_n_as_completed
+get_timer_wheel = __import__('5-timer_wheel').get_timer_wheel
+event_loops = __import__('6-event_loops')
+measure = __import__('7-measure').measure
+wait_random = __import__('0-basic_async_syntax').wait_random
+
+ASYNC_COMPREHENSION_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir,
+    '0x02-python_async_comprehension')
+
+BENCHMARKS: Dict[str, Callable[..., None]] = {}
+
+
+def benchmark(fn: Callable[..., None]) -> Callable[..., None]:
+    '''Registers a benchmark under its function name.
+    '''
+    BENCHMARKS[fn.__name__.replace('bench_', '')] = fn
+    return fn
+
+
+def report(label: str, seconds: float, **extra: object) -> None:
+    '''Prints one result line.
+    '''
+    details = ' '.join('{}={}'.format(k, v) for k, v in extra.items())
+    print('{:<32} {:>9.3f}s {}'.format(label, seconds, details).rstrip())
+
+
+def peak_memory(run: Callable[[], Awaitable]) -> float:
+    '''Runs `run()` on a new loop and returns its peak traced memory
+    in MiB.
+    '''
+    tracemalloc.start()
+    try:
+        asyncio.run(run())
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def _timed_run(fn: Callable[..., Awaitable], *args: Any
+               ) -> Tuple[float, float]:
+    '''Runs `fn(*args)` on a new loop and returns its duration and
+    the process' peak RSS in MiB.
+    '''
+    start = time.perf_counter()
+    asyncio.run(fn(*args))
+    seconds = time.perf_counter() - start
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_isolated(fn: Callable[..., Awaitable], *args: Any
+                 ) -> Tuple[float, float]:
+    '''_timed_run in a forked process, so that each run's peak RSS is
+    its own.
+    '''
+    with multiprocessing.get_context('fork').Pool(1) as pool:
+        return pool.apply(_timed_run, (fn,) + args)
+
+
+def mib(value: float) -> str:
+    '''Formats a MiB amount.
+    '''
+    return '{:.1f}MiB'.format(value)
+
+
+@benchmark
+def bench_as_completed(n: int = 100_000) -> None:
+    '''Time to first result, total time and peak memory of n waits of
+    at most 1s: gather + sorted vs completion order streaming.
+    '''
+    for label, gathered in (('wait_n', wait_n),
+                            ('task_wait_n', task_wait_n)):
+        start = time.perf_counter()
+        asyncio.run(gathered(n, 1))
+        total = time.perf_counter() - start
+        report(label, total, first='{:.3f}s'.format(total),
+               peak=mib(peak_memory(lambda: gathered(n, 1))))
+
+    for label, streamed in (('wait_n_as_completed', wait_n_as_completed),
+                            ('task_wait_n_as_completed',
+                             task_wait_n_as_completed)):
+        async def consume() -> Tuple[Optional[float], int]:
+            '''Drains the stream, timing its first item.'''
+            first, count = None, 0
+            async for _ in streamed(n, 1):
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            return first, count
+
+        start = time.perf_counter()
+        first, count = asyncio.run(consume())
+        report(label, time.perf_counter() - start,
+               first='{:.3f}s'.format(first),
+               peak=mib(peak_memory(consume)))
+
+
+@benchmark
+def bench_max_concurrency(n: int = 10_000_000) -> None:
+    '''wait_n and task_wait_n of 1k to n waits of at most 1ms, all at
+    once (gather, up to 1M) and with max_concurrency=1000.
+    '''
+    sizes = [10 ** exponent for exponent in range(3, 8)
+             if 10 ** exponent <= n] or [n]
+    for size in sizes:
+        for name, fn in (('wait_n', wait_n), ('task_wait_n', task_wait_n)):
+            if size <= 1_000_000:
+                seconds, rss = run_isolated(fn, size, 1e-3)
+                report('{} n={}'.format(name, size), seconds,
+                       us_op='{:.1f}'.format(seconds / size * 1e6),
+                       rss=mib(rss))
+            seconds, rss = run_isolated(fn, size, 1e-3, 1000)
+            report('{} n={} bounded'.format(name, size), seconds,
+                   us_op='{:.1f}'.format(seconds / size * 1e6),
+                   rss=mib(rss))
+
+
+@benchmark
+def bench_timer_wheel(n: int = 1_000_000) -> None:
+    '''wait_n of n waits of at most 1s on plain asyncio.sleep and on
+    timer wheels. Overhead is the time past the longest wait, per
+    million sleeps.
+    '''
+    for resolution in (None, 1e-3, 1e-2):
+        async def run() -> int:
+            '''Runs wait_n and returns the loop timers it scheduled.'''
+            await wait_n(n, 1, resolution=resolution)
+            if resolution is None:
+                return n
+            return get_timer_wheel(resolution).timers
+
+        start = time.perf_counter()
+        timers = asyncio.run(run())
+        seconds = time.perf_counter() - start
+        report('resolution={}'.format(resolution), seconds,
+               overhead='{:.2f}s/M'.format((seconds - 1) / n * 1e6),
+               timers=timers)
+
+
+def load_async_comprehension(name: str) -> ModuleType:
+    '''Loads the 0x02 module `name` from its file, registered under
+    that name so that the 0x02 modules importing it find it.
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(ASYNC_COMPREHENSION_DIR, name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def async_comprehension() -> Callable[[], Awaitable]:
+    '''Loads async_comprehension from 0x02, without adding that
+    directory to sys.path.
+    '''
+    load_async_comprehension('0-async_generator')
+    return load_async_comprehension('1-async_comprehension'
+                                    ).async_comprehension
+
+
+@benchmark
+def bench_event_loops(n: int = 10_000, trials: int = 3) -> None:
+    '''Throughput and run latency of wait_n and task_wait_n (n waits of
+    at most 1ms) and of n // 100 concurrent async_comprehension (10s
+    each), on every loop available here.
+    '''
+    comprehension = async_comprehension()
+    comprehensions = max(1, n // 100)
+
+    async def comprehend() -> None:
+        '''Runs async_comprehension concurrently.'''
+        await asyncio.gather(*(comprehension()
+                               for _ in range(comprehensions)))
+
+    workloads = (
+        ('wait_n', lambda: wait_n(n, 1e-3), n),
+        ('task_wait_n', lambda: task_wait_n(n, 1e-3), n),
+        ('async_comprehension', comprehend, comprehensions * 10),
+    )
+    for loop_name, factory in event_loops.loop_factories().items():
+        for label, workload, operations in workloads:
+            runs = []
+            for _ in range(trials):
+                start = time.perf_counter()
+                event_loops.run(workload(), factory)
+                runs.append(time.perf_counter() - start)
+            median = statistics.median(runs)
+            report('{} {}'.format(loop_name, label), sum(runs),
+                   ops_s='{:.0f}'.format(operations / median),
+                   median='{:.3f}s'.format(median),
+                   max='{:.3f}s'.format(max(runs)))
+
+
+@benchmark
+def bench_latency(n: int = 10_000) -> None:
+    '''Statistics of 5 trials (after 1 warmup) of n concurrent waits of
+    at most 1ms, with per-coroutine latencies, plain and on a 1ms timer
+    wheel.
+    '''
+    for resolution in (None, 1e-3):
+        result = measure(lambda: wait_random(1e-3, resolution), n=n,
+                         trials=5, warmup=1, latencies=True)
+        for name, summary in (('trial', result.trials),
+                              ('coroutine', result.latencies)):
+            report('resolution={} {}'.format(resolution, name),
+                   summary.median / 1e9, **{
+                       field: '{:.3f}ms'.format(value / 1e6)
+                       for field, value in summary._asdict().items()
+                       if field not in ('count', 'median')})
+        print('  histogram: ' + ' '.join(
+            '<{:.3f}ms:{}'.format(bound / 1e6, count)
+            for bound, count in result.histogram.items()))
+
+
+def main() -> None:
+    '''Command line entry point.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='one of: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--n', type=int)
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmark: ' + ', '.join(sorted(unknown)))
+    for name in args.names or BENCHMARKS:
+        print('== {}'.format(name))
+        if args.n is None:
+            BENCHMARKS[name]()
+        else:
+            BENCHMARKS[name](args.n)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,31 @@
 '''Task 4's module.
 '''
 import asyncio
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 
 task_wait_random = __import__('3-tasks').task_wait_random
+as_completed = __import__('1-concurrent_coroutines').as_completed
+run_bounded = __import__('1-concurrent_coroutines').run_bounded
 
 
-async def task_wait_n(n: int, max_delay: int) -> List[float]:
+async def task_wait_n(n: int, max_delay: int,
+                      max_concurrency: Optional[int] = None) -> List[float]:
     '''Executes task_wait_random n times.
+    With `max_concurrency`, at most that many tasks exist at once.
     '''
+    if max_concurrency is not None:
+        return await run_bounded(lambda: task_wait_random(max_delay), n,
+                                 max_concurrency)
     wait_times = await asyncio.gather(
         *tuple(map(lambda _: task_wait_random(max_delay), range(n)))
     )
     return sorted(wait_times)
+
+
+def task_wait_n_as_completed(n: int,
+                             max_delay: int) -> AsyncIterator[float]:
+    '''Executes task_wait_random n times, yielding each delay as soon
+    as its task is done.
+    '''
+    return as_completed(task_wait_random(max_delay) for _ in range(n))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+'''Task 5's module.
+'''
+import asyncio
+import math
+import weakref
+from typing import Any, Dict, MutableMapping
+
+
+DEFAULT_RESOLUTION = 1e-3
+
+
+class TimerWheel:
+    '''Coalesces the sleeps of one event loop into shared wake-ups.
+    Deadlines are rounded up to a multiple of `resolution` seconds and
+    bucketed in slots. Each slot schedules a single loop timer that
+    wakes all of its sleepers, so a million sleeps cost one timer heap
+    entry per distinct slot instead of one each. Sleeps may last up to
+    one resolution longer than asked. A wheel must only be used from
+    one loop, see get_timer_wheel.
+    '''
+
+    def __init__(self, resolution: float = DEFAULT_RESOLUTION) -> None:
+        '''Init method of TimerWheel.
+        '''
+        if resolution <= 0:
+            raise ValueError('resolution must be > 0')
+        self.resolution = resolution
+        self.timers = 0
+        self.sleeps = 0
+        self._slots: Dict[int, Dict[asyncio.Future, None]] = {}
+        self._handles: Dict[int, asyncio.TimerHandle] = {}
+
+    async def sleep(self, delay: float, result: Any = None) -> Any:
+        '''Drop-in for asyncio.sleep on the wheel's loop.
+        A cancelled sleeper leaves its slot, and the slot's timer is
+        cancelled with its last sleeper.
+        '''
+        if delay <= 0:
+            return await asyncio.sleep(0, result)
+        loop = asyncio.get_running_loop()
+        tick = math.ceil((loop.time() + delay) / self.resolution)
+        waiters = self._slots.get(tick)
+        if waiters is None:
+            waiters = self._slots[tick] = {}
+            self._handles[tick] = loop.call_at(tick * self.resolution,
+                                               self._fire, tick)
+            self.timers += 1
+        future = loop.create_future()
+        waiters[future] = None
+        self.sleeps += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._discard(tick, future)
+            raise
+        return result
+
+    def _discard(self, tick: int, future: asyncio.Future) -> None:
+        '''Removes a cancelled sleeper from its slot, dropping the slot
+        once empty.
+        '''
+        waiters = self._slots.get(tick)
+        if waiters is None or future not in waiters:
+            return
+        del waiters[future]
+        if not waiters:
+            del self._slots[tick]
+            self._handles.pop(tick).cancel()
+
+    def _fire(self, tick: int) -> None:
+        '''Wakes every sleeper of a slot.
+        '''
+        del self._handles[tick]
+        for future in self._slots.pop(tick):
+            if not future.done():
+                future.set_result(None)
+
+    def __len__(self) -> int:
+        '''Number of pending slots.
+        '''
+        return len(self._slots)
+
+
+_wheels: MutableMapping[asyncio.AbstractEventLoop,
+                        Dict[float, TimerWheel]] = weakref.WeakKeyDictionary()
+
+
+def get_timer_wheel(resolution: float = DEFAULT_RESOLUTION) -> TimerWheel:
+    '''Returns the running loop's wheel for `resolution`, creating it
+    on first use.
+    '''
+    loop = asyncio.get_running_loop()
+    wheels = _wheels.setdefault(loop, {})
+    wheel = wheels.get(resolution)
+    if wheel is None:
+        wheel = wheels[resolution] = TimerWheel(resolution)
+    return wheel
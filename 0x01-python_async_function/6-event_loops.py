@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+'''Task 6's module.
+'''
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+
+def default_loop() -> asyncio.AbstractEventLoop:
+    '''Creates a loop of the default asyncio implementation.
+    '''
+    return asyncio.new_event_loop()
+
+
+def eager(factory: LoopFactory) -> LoopFactory:
+    '''Wraps a loop factory so that its loops start tasks eagerly:
+    a new task runs right away until it first suspends, and one that
+    never suspends does not go through the loop at all (Python 3.12+).
+    '''
+    def eager_loop() -> asyncio.AbstractEventLoop:
+        '''Creates a loop with the eager task factory.
+        '''
+        loop = factory()
+        loop.set_task_factory(asyncio.eager_task_factory)
+        return loop
+    return eager_loop
+
+
+def loop_factories() -> Dict[str, LoopFactory]:
+    '''Returns the loop factories usable here, by name: 'default',
+    'eager' on Python 3.12+, 'uvloop' when uvloop is installed and
+    'uvloop+eager' when both are.
+    '''
+    has_eager = hasattr(asyncio, 'eager_task_factory')
+    factories = {'default': default_loop}
+    if has_eager:
+        factories['eager'] = eager(default_loop)
+    try:
+        import uvloop
+    except ImportError:
+        return factories
+    factories['uvloop'] = uvloop.new_event_loop
+    if has_eager:
+        factories['uvloop+eager'] = eager(uvloop.new_event_loop)
+    return factories
+
+
+def get_loop_factory(name: str) -> LoopFactory:
+    '''Returns the loop factory called `name`, see loop_factories.
+    '''
+    factories = loop_factories()
+    if name not in factories:
+        raise ValueError('unknown or unavailable loop {!r}, expected one '
+                         'of: {}'.format(name, ', '.join(factories)))
+    return factories[name]
+
+
+def run(main: Awaitable, loop_factory: Optional[LoopFactory] = None) -> Any:
+    '''Runs `main` to completion like asyncio.run, on a new loop from
+    `loop_factory` (the default loop when None, as asyncio.run does).
+    Custom loop factories need Python 3.11+.
+    '''
+    if loop_factory is None:
+        return asyncio.run(main)
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(main)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+'''Task 7's module.
+'''
+import asyncio
+import math
+import statistics
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+
+run = __import__('6-event_loops').run
+
+
+class Summary(NamedTuple):
+    '''Statistics of nanosecond samples.
+    '''
+    count: int
+    min: int
+    median: float
+    p95: float
+    p99: float
+    max: int
+    mean: float
+    stddev: float
+
+
+class Measurement(NamedTuple):
+    '''Result of measure: the wall time of each trial and, when asked
+    for, the latency of every coroutine with its histogram.
+    '''
+    trials: Summary
+    latencies: Optional[Summary] = None
+    histogram: Optional[Dict[int, int]] = None
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    '''Returns the q-th (0 to 100) percentile of sorted samples,
+    interpolating between the closest ranks.
+    '''
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples: Iterable[int]) -> Summary:
+    '''Computes the Summary of nanosecond samples.
+    '''
+    ordered = sorted(samples)
+    if not ordered:
+        raise ValueError('no samples to summarize')
+    return Summary(
+        count=len(ordered),
+        min=ordered[0],
+        median=statistics.median(ordered),
+        p95=percentile(ordered, 95),
+        p99=percentile(ordered, 99),
+        max=ordered[-1],
+        mean=statistics.fmean(ordered),
+        stddev=statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    )
+
+
+def histogram(samples: Iterable[int]) -> Dict[int, int]:
+    '''Counts samples in power of two buckets, keyed by their
+    exclusive upper bound in nanoseconds.
+    '''
+    counts: Dict[int, int] = {}
+    for sample in samples:
+        bound = 1 << max(sample, 0).bit_length()
+        counts[bound] = counts.get(bound, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+async def _timed(aw: Awaitable, samples: List[int]) -> Any:
+    '''Awaits `aw`, appending its latency to samples.
+    '''
+    start = time.perf_counter_ns()
+    try:
+        return await aw
+    finally:
+        samples.append(time.perf_counter_ns() - start)
+
+
+async def measure_async(spawn: Callable[[], Awaitable], n: int = 1,
+                        trials: int = 5, warmup: int = 1,
+                        latencies: bool = False) -> Measurement:
+    '''Measures n concurrent `spawn()` calls on the running loop.
+    They are run `warmup` times unmeasured, then `trials` times timed
+    with time.perf_counter_ns. With `latencies`, each call is also
+    timed on its own and the measurement adds their summary and
+    histogram across all trials.
+    '''
+    if trials < 1:
+        raise ValueError('trials must be >= 1')
+    durations: List[int] = []
+    samples: List[int] = []
+    for trial in range(warmup + trials):
+        measured = trial >= warmup
+        if measured and latencies:
+            calls = (_timed(spawn(), samples) for _ in range(n))
+        else:
+            calls = (spawn() for _ in range(n))
+        start = time.perf_counter_ns()
+        if n == 1:
+            await next(calls)
+        else:
+            await asyncio.gather(*calls)
+        if measured:
+            durations.append(time.perf_counter_ns() - start)
+    if not latencies:
+        return Measurement(summarize(durations))
+    return Measurement(summarize(durations), summarize(samples),
+                       histogram(samples))
+
+
+def measure(spawn: Callable[[], Awaitable], n: int = 1, trials: int = 5,
+            warmup: int = 1, latencies: bool = False,
+            loop_factory: Optional[Callable] = None) -> Measurement:
+    '''Runs measure_async on a new loop from `loop_factory` (see
+    6-event_loops), the default one when None.
+    '''
+    return run(measure_async(spawn, n, trials, warmup, latencies),
+               loop_factory)
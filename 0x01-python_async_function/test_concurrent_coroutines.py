@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Unittests for the bounded and completion order modes of task 1
+"""
+
+import asyncio
+import unittest
+from typing import Iterator
+from unittest.mock import patch
+from parameterized import parameterized
+
+
+concurrent_coroutines = __import__('1-concurrent_coroutines')
+as_completed = concurrent_coroutines.as_completed
+run_bounded = concurrent_coroutines.run_bounded
+wait_n_as_completed = concurrent_coroutines.wait_n_as_completed
+
+
+async def echo(value: int, delay: float = 0) -> int:
+    """Returns value after delay"""
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail(delay: float = 0) -> int:
+    """Raises ValueError after delay"""
+    await asyncio.sleep(delay)
+    raise ValueError("boom")
+
+
+class TestAsCompleted(unittest.IsolatedAsyncioTestCase):
+    """
+    Testing as_completed
+    """
+
+    @parameterized.expand([(0,), (1,), (4,), (9,), (100,)])
+    async def test_all_results(self, n: int) -> None:
+        """
+        Testing that each of n results comes out once, across batches
+        """
+        with patch.object(concurrent_coroutines, "SPAWN_BATCH", 4):
+            tasks = [asyncio.ensure_future(echo(i, (n - i) * 1e-4))
+                     for i in range(n)]
+            results = [result async for result in as_completed(tasks)]
+        self.assertEqual(sorted(results), list(range(n)))
+
+    async def test_completion_order(self) -> None:
+        """
+        Testing that results come out as their tasks complete
+        """
+        delays = [0.09, 0.03, 0.06]
+        tasks = [asyncio.ensure_future(echo(i, delay))
+                 for i, delay in enumerate(delays)]
+        self.assertEqual([result async for result in as_completed(tasks)],
+                         [1, 2, 0])
+
+    async def test_batched_spawning(self) -> None:
+        """
+        Testing that early results come out before every task is
+        spawned
+        """
+        spawned = 0
+
+        def spawn() -> Iterator[asyncio.Future]:
+            """Spawns 10 tasks, counting them"""
+            nonlocal spawned
+            for i in range(10):
+                spawned += 1
+                yield asyncio.ensure_future(echo(i))
+
+        with patch.object(concurrent_coroutines, "SPAWN_BATCH", 2):
+            stream = as_completed(spawn())
+            self.assertIn(await stream.__anext__(), range(10))
+            self.assertLess(spawned, 10)
+            self.assertEqual(spawned % 2, 0)
+            rest = [result async for result in stream]
+        self.assertEqual(spawned, 10)
+        self.assertEqual(len(rest), 9)
+
+    async def test_early_stop_cancels_pending(self) -> None:
+        """
+        Testing that closing the stream cancels the pending tasks
+        """
+        tasks = [asyncio.ensure_future(echo(i, i * 0.05 + 0.01))
+                 for i in range(5)]
+        stream = as_completed(tasks)
+        self.assertEqual(await stream.__anext__(), 0)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        self.assertEqual([task.cancelled() for task in tasks],
+                         [False] + [True] * 4)
+
+    async def test_failure_propagates(self) -> None:
+        """
+        Testing that a failing task raises its error to the consumer
+        and cancels the others
+        """
+        tasks = [asyncio.ensure_future(echo(0)),
+                 asyncio.ensure_future(fail(0.01)),
+                 asyncio.ensure_future(echo(2, 10))]
+        results = []
+        with self.assertRaisesRegex(ValueError, "boom"):
+            async for result in as_completed(tasks):
+                results.append(result)
+        await asyncio.sleep(0)
+        self.assertEqual(results, [0])
+        self.assertTrue(tasks[2].cancelled())
+
+    async def test_wait_n_as_completed(self) -> None:
+        """
+        Testing that wait_n_as_completed yields n delays
+        """
+        delays = [delay async for delay in wait_n_as_completed(20, 0.01)]
+        self.assertEqual(len(delays), 20)
+        self.assertTrue(all(0 <= delay <= 0.01 for delay in delays))
+
+
+class TestRunBounded(unittest.IsolatedAsyncioTestCase):
+    """
+    Testing run_bounded
+    """
+
+    def setUp(self) -> None:
+        """Track the calls and how many run at once"""
+        self.calls = self.running = self.peak = 0
+
+    async def spawn(self) -> float:
+        """A call returning minus its number, failing at `fail_at`"""
+        self.calls += 1
+        call = self.calls
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.001 * (call % 3))
+            if call == getattr(self, "fail_at", None):
+                raise ValueError("boom")
+            return -call
+        finally:
+            self.running -= 1
+
+    @parameterized.expand([(0, 3), (1, 3), (10, 3), (10, 1), (5, 10)])
+    async def test_sorted_results(self, n: int, limit: int) -> None:
+        """
+        Testing sorted results and the concurrency bound
+        """
+        self.assertEqual(await run_bounded(self.spawn, n, limit),
+                         list(range(-n, 0)))
+        self.assertEqual(self.calls, n)
+        self.assertEqual(self.peak, min(n, limit))
+
+    @parameterized.expand([(0,), (-1,)])
+    async def test_invalid_concurrency(self, limit: int) -> None:
+        """
+        Testing that at least one call must be allowed at once
+        """
+        with self.assertRaises(ValueError):
+            await run_bounded(self.spawn, 10, limit)
+        self.assertEqual(self.calls, 0)
+
+    async def test_failure_stops_spawning(self) -> None:
+        """
+        Testing that a failing call stops the other workers
+        """
+        self.fail_at = 3
+        with self.assertRaisesRegex(ValueError, "boom"):
+            await run_bounded(self.spawn, 10000, 2)
+        calls = self.calls
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.calls, calls)
+        self.assertEqual(self.running, 0)
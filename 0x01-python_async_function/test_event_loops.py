@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Unittests for the loop factories of task 6
+"""
+
+import asyncio
+import unittest
+from typing import List
+
+
+event_loops = __import__('6-event_loops')
+default_loop = event_loops.default_loop
+eager = event_loops.eager
+get_loop_factory = event_loops.get_loop_factory
+loop_factories = event_loops.loop_factories
+run = event_loops.run
+measure_time = __import__('2-measure_runtime').measure_time
+
+
+async def running_loop() -> asyncio.AbstractEventLoop:
+    """Returns the running loop"""
+    return asyncio.get_running_loop()
+
+
+class TestEventLoops(unittest.TestCase):
+    """
+    Testing the loop factories and run
+    """
+
+    def setUp(self) -> None:
+        """Track the loops built by `self.factory`"""
+        self.loops: List[asyncio.AbstractEventLoop] = []
+
+    def factory(self) -> asyncio.AbstractEventLoop:
+        """A default loop factory recording its loops"""
+        loop = default_loop()
+        self.loops.append(loop)
+        return loop
+
+    def test_loop_factories(self) -> None:
+        """
+        Testing that the default loop is always available
+        """
+        factories = loop_factories()
+        self.assertIs(factories["default"], default_loop)
+        self.assertEqual(
+            "eager" in factories, hasattr(asyncio, "eager_task_factory"))
+        for name, factory in factories.items():
+            self.assertEqual(get_loop_factory(name).__name__,
+                             factory.__name__)
+
+    def test_unknown_loop(self) -> None:
+        """
+        Testing that unknown loop names are rejected
+        """
+        with self.assertRaisesRegex(ValueError, "default"):
+            get_loop_factory("no-such-loop")
+
+    def test_run(self) -> None:
+        """
+        Testing that run uses a loop built by the factory, and closes it
+        """
+        loop = run(running_loop(), self.factory)
+        self.assertEqual(self.loops, [loop])
+        self.assertTrue(loop.is_closed())
+
+    def test_run_default(self) -> None:
+        """
+        Testing that run works like asyncio.run without a factory
+        """
+        loop = run(running_loop())
+        self.assertIsInstance(loop, asyncio.AbstractEventLoop)
+        self.assertTrue(loop.is_closed())
+
+    @unittest.skipUnless(hasattr(asyncio, "eager_task_factory"),
+                         "eager tasks need Python 3.12+")
+    def test_eager(self) -> None:
+        """
+        Testing that eager loops start tasks eagerly
+        """
+        loop = eager(self.factory)()
+        self.addCleanup(loop.close)
+        self.assertEqual(self.loops, [loop])
+        self.assertIs(loop.get_task_factory(), asyncio.eager_task_factory)
+
+        async def started() -> bool:
+            """Whether a new task ran before being awaited"""
+            steps = []
+
+            async def step() -> None:
+                steps.append(1)
+
+            task = asyncio.ensure_future(step())
+            ran = bool(steps)
+            await task
+            return ran
+
+        self.assertTrue(loop.run_until_complete(started()))
+
+    def test_measure_time(self) -> None:
+        """
+        Testing that measure_time runs on a loop of the factory
+        """
+        self.assertGreaterEqual(measure_time(5, 0, self.factory), 0)
+        self.assertEqual(len(self.loops), 1)
+        self.assertTrue(self.loops[0].is_closed())
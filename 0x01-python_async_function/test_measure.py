@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Unittests for the measurement API of task 7
+"""
+
+import asyncio
+import itertools
+import unittest
+from typing import List
+from unittest.mock import patch
+from parameterized import parameterized
+
+
+measure_module = __import__('7-measure')
+Summary = measure_module.Summary
+histogram = measure_module.histogram
+measure = measure_module.measure
+measure_async = measure_module.measure_async
+percentile = measure_module.percentile
+summarize = measure_module.summarize
+
+
+class TestStatistics(unittest.TestCase):
+    """
+    Testing percentile, summarize and histogram on fixed samples
+    """
+    samples = list(range(1, 101))
+
+    @parameterized.expand([
+        (0, 1), (50, 50.5), (95, 95.05), (99, 99.01), (100, 100),
+    ])
+    def test_percentile(self, q: float, expected: float) -> None:
+        """
+        Testing percentiles interpolated between the closest ranks
+        """
+        self.assertAlmostEqual(percentile(self.samples, q), expected)
+
+    def test_percentile_single_sample(self) -> None:
+        """
+        Testing that any percentile of one sample is that sample
+        """
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_summarize(self) -> None:
+        """
+        Testing the summary of unordered samples
+        """
+        summary = summarize(reversed(self.samples))
+        self.assertEqual(summary[:3], (100, 1, 50.5))
+        self.assertAlmostEqual(summary.p95, 95.05)
+        self.assertAlmostEqual(summary.p99, 99.01)
+        self.assertEqual(summary.max, 100)
+        self.assertEqual(summary.mean, 50.5)
+        self.assertAlmostEqual(summary.stddev, 29.011491975882016)
+
+    def test_summarize_single_sample(self) -> None:
+        """
+        Testing that one sample has a null standard deviation
+        """
+        self.assertEqual(summarize([42]),
+                         Summary(1, 42, 42, 42, 42, 42, 42.0, 0.0))
+
+    def test_summarize_no_samples(self) -> None:
+        """
+        Testing that there must be samples to summarize
+        """
+        with self.assertRaises(ValueError):
+            summarize([])
+
+    def test_histogram(self) -> None:
+        """
+        Testing power of two buckets keyed by their exclusive bound
+        """
+        self.assertEqual(histogram([1024, 0, 1, 2, 3, 4, 7, 8, 1023, -5]),
+                         {1: 2, 2: 1, 4: 2, 8: 2, 16: 1, 1024: 1, 2048: 1})
+        self.assertEqual(histogram([]), {})
+
+
+class TestMeasure(unittest.TestCase):
+    """
+    Testing measure and measure_async, on a clock ticking 10ns per
+    reading
+    """
+
+    def setUp(self) -> None:
+        """Count the spawned calls and fake the clock"""
+        self.calls: List[int] = []
+        clock = itertools.count(0, 10)
+        patcher = patch.object(measure_module.time, "perf_counter_ns",
+                               side_effect=lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def call(self) -> int:
+        """A measured coroutine"""
+        self.calls.append(len(self.calls))
+        return len(self.calls)
+
+    def test_trials(self) -> None:
+        """
+        Testing that warmups are run but not measured
+        """
+        result = measure(self.call, trials=3, warmup=2)
+        self.assertEqual(len(self.calls), 5)
+        self.assertEqual(result.trials.count, 3)
+        self.assertEqual((result.trials.min, result.trials.max), (10, 10))
+        self.assertIsNone(result.latencies)
+        self.assertIsNone(result.histogram)
+
+    def test_latencies(self) -> None:
+        """
+        Testing per call latencies of every measured trial
+        """
+        result = asyncio.run(measure_async(self.call, n=4, trials=2,
+                                           warmup=1, latencies=True))
+        self.assertEqual(len(self.calls), 12)
+        self.assertEqual(result.trials.count, 2)
+        self.assertEqual(result.latencies.count, 8)
+        self.assertEqual((result.latencies.min, result.latencies.max),
+                         (10, 10))
+        self.assertEqual(result.histogram, {16: 8})
+
+    def test_no_warmup(self) -> None:
+        """
+        Testing that every run is measured without warmup
+        """
+        result = measure(self.call, n=2, trials=1, warmup=0)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(result.trials.count, 1)
+
+    def test_invalid_trials(self) -> None:
+        """
+        Testing that at least one trial is needed
+        """
+        with self.assertRaises(ValueError):
+            measure(self.call, trials=0)
+        self.assertEqual(self.calls, [])
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Unittests for the timer wheel of task 5
+"""
+
+import asyncio
+import unittest
+from parameterized import parameterized
+
+
+timer_wheel = __import__('5-timer_wheel')
+TimerWheel = timer_wheel.TimerWheel
+get_timer_wheel = timer_wheel.get_timer_wheel
+
+
+class TestTimerWheel(unittest.IsolatedAsyncioTestCase):
+    """
+    Testing TimerWheel sleeps
+    """
+
+    async def timed_sleep(self, wheel: TimerWheel, delay: float) -> float:
+        """Sleeps on the wheel and returns the loop time it took"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await wheel.sleep(delay)
+        return loop.time() - start
+
+    @parameterized.expand([(0.01,), (0.05,)])
+    async def test_sleep_rounded_up(self, resolution: float) -> None:
+        """
+        Testing that no sleep ends before its delay, nor much later
+        than one resolution after it
+        """
+        wheel = TimerWheel(resolution)
+        delays = [0.001, 0.013, 0.02, 0.037, 0.05, 0.061]
+        elapsed = await asyncio.gather(
+            *(self.timed_sleep(wheel, delay) for delay in delays))
+        for delay, seconds in zip(delays, elapsed):
+            self.assertGreaterEqual(seconds, delay)
+            self.assertLess(seconds, delay + resolution + 0.05)
+        self.assertEqual(len(wheel), 0)
+
+    async def test_one_timer_per_slot(self) -> None:
+        """
+        Testing that sleeps sharing a slot share its loop timer
+        """
+        wheel = TimerWheel(0.05)
+        self.assertEqual(await asyncio.gather(
+            *(wheel.sleep(0.01, i) for i in range(100))), list(range(100)))
+        self.assertEqual(wheel.sleeps, 100)
+        self.assertLessEqual(wheel.timers, 2)
+
+    async def test_cancelled_sleeper_skipped(self) -> None:
+        """
+        Testing that the other sleepers of a slot still wake up
+        """
+        wheel = TimerWheel(0.05)
+        sleepers = [asyncio.ensure_future(wheel.sleep(0.01, i))
+                    for i in range(3)]
+        await asyncio.sleep(0)
+        sleepers[1].cancel()
+        results = await asyncio.gather(*sleepers, return_exceptions=True)
+        self.assertEqual(results[0], 0)
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+        self.assertEqual(results[2], 2)
+        self.assertEqual(len(wheel), 0)
+
+    async def test_cancelled_sleeper_leaves_no_slot(self) -> None:
+        """
+        Testing that cancelling the last sleeper of a slot drops it
+        along with its loop timer
+        """
+        loop = asyncio.get_running_loop()
+        wheel = TimerWheel(0.05)
+        sleeper = asyncio.ensure_future(wheel.sleep(10))
+        await asyncio.sleep(0)
+        self.assertEqual(len(wheel), 1)
+        timers = len(loop._scheduled)
+        sleeper.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await sleeper
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual(sum(not handle.cancelled()
+                             for handle in loop._scheduled), timers - 1)
+
+    async def test_no_delay(self) -> None:
+        """
+        Testing that non-positive delays do not use a slot
+        """
+        wheel = TimerWheel()
+        self.assertEqual(await wheel.sleep(0, "done"), "done")
+        self.assertEqual(await wheel.sleep(-1, "done"), "done")
+        self.assertEqual(wheel.timers, 0)
+
+    def test_invalid_resolution(self) -> None:
+        """
+        Testing that the resolution must be positive
+        """
+        with self.assertRaises(ValueError):
+            TimerWheel(0)
+
+
+class TestGetTimerWheel(unittest.TestCase):
+    """
+    Testing get_timer_wheel
+    """
+
+    def test_one_wheel_per_loop(self) -> None:
+        """
+        Testing one wheel per loop and resolution
+        """
+        async def wheels() -> tuple:
+            """The running loop's wheels"""
+            return (get_timer_wheel(), get_timer_wheel(),
+                    get_timer_wheel(0.01))
+
+        first, same, coarse = asyncio.run(wheels())
+        self.assertIs(first, same)
+        self.assertIsNot(first, coarse)
+        self.assertEqual(coarse.resolution, 0.01)
+        self.assertIsNot(asyncio.run(wheels())[0], first)
+
+    def test_no_running_loop(self) -> None:
+        """
+        Testing that a wheel needs a running loop
+        """
+        with self.assertRaises(RuntimeError):
+            get_timer_wheel()
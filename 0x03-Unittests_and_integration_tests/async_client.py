@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""An asyncio github org client
+"""
+import asyncio
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import parse_qsl, urlsplit
+
+import aiohttp
+
+from async_utils import (
+    MAX_CONCURRENCY,
+    gather_bounded,
+    get_json_async,
+    get_json_page_async,
+    get_json_stream_async,
+)
+from caches import MemoryResponseCache, ResponseCache
+from client import (
+    CACHE_MAXSIZE,
+    CACHE_MAX_STALE,
+    CACHE_TTL,
+    MAX_IN_FLIGHT,
+    GithubOrgClient,
+    LicenseFilter,
+    LicenseIndex,
+    OrgResult,
+    make_repo_filter,
+)
+from metrics import instrumentation
+from ratelimit import PRIORITY_PAGE
+from utils import async_memoize, with_query
+
+
+class AsyncGithubOrgClient:
+    """An asyncio Github org client
+    Like GithubOrgClient, payloads are shared between instances through
+    `shared_cache`, holding fully loaded repos lists.
+    Example
+    -------
+    >>> async def main():
+    ...     client = AsyncGithubOrgClient("google")
+    ...     return await client.public_repos("apache-2.0")
+    """
+    ORG_URL = GithubOrgClient.ORG_URL
+    PER_PAGE = GithubOrgClient.PER_PAGE
+
+    shared_cache: Optional[ResponseCache] = MemoryResponseCache(
+        maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+
+    has_license = staticmethod(GithubOrgClient.has_license)
+
+    def __init__(self, org_name: str, per_page: int = PER_PAGE,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 stream: bool = False) -> None:
+        """Init method of AsyncGithubOrgClient.
+        `max_concurrency` bounds the repos pages fetched at once and
+        `session` defaults to the shared session of the running loop.
+        With `stream`, iter_public_repos parses repos one at a time from
+        the response bodies instead of walking the repos pages.
+        """
+        self._org_name = org_name
+        self._per_page = per_page
+        self._max_concurrency = max_concurrency
+        self._session = session
+        self._stream = stream
+
+    async def _shared(self, url: str,
+                      fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        """`await fetch(url)` through the shared cache"""
+        if self.shared_cache is None:
+            return await fetch(url)
+        found, value = self.shared_cache.get(url)
+        if not found:
+            value = await fetch(url)
+            self.shared_cache.set(url, value)
+        return value
+
+    @async_memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE,
+                   max_stale=CACHE_MAX_STALE)
+    async def org(self) -> Dict:
+        """Memoize org"""
+        return await self._shared(
+            self.ORG_URL.format(org=self._org_name),
+            lambda url: get_json_async(url, self._session))
+
+    async def _public_repos_url(self) -> str:
+        """Public repos URL"""
+        return (await self.org())["repos_url"]
+
+    @async_memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE,
+                   max_stale=CACHE_MAX_STALE)
+    async def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload over all pages.
+        When the first page advertises `rel="last"`, the remaining pages
+        are fetched concurrently; otherwise `rel="next"` is followed.
+        """
+        return await self._shared(
+            await self._public_repos_url(),
+            lambda url: self._fetch_pages(
+                with_query(url, per_page=self._per_page)))
+
+    async def _fetch_pages(self, url: str) -> List[Any]:
+        """Fetch every page starting at `url`"""
+        payload, links = await get_json_page_async(url, self._session)
+        # The first page may be shared with coalesced callers
+        payload = list(payload)
+        last_page = _page_number(links.get("last"))
+        if last_page is not None:
+            pages = await gather_bounded(
+                (get_json_async(with_query(url, page=page), self._session,
+                                PRIORITY_PAGE)
+                 for page in range(2, last_page + 1)),
+                self._max_concurrency)
+            for page in pages:
+                payload.extend(page)
+            return payload
+        while "next" in links:
+            page, links = await get_json_page_async(links["next"],
+                                                    self._session)
+            payload.extend(page)
+        return payload
+
+    @async_memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE)
+    async def _indexed_payload(self) -> Tuple[List[Dict], LicenseIndex]:
+        """Memoize the repos payload with its license index"""
+        payload = await self.repos_payload()
+        return payload, LicenseIndex(payload)
+
+    async def license_index(self) -> LicenseIndex:
+        """License index of the current repos payload"""
+        payload = await self.repos_payload()
+        indexed = await self._indexed_payload()
+        if indexed[0] is not payload:
+            indexed = await type(self)._indexed_payload.refresh(self)
+        return indexed[1]
+
+    async def _iter_pages(self) -> AsyncIterator[Dict]:
+        """Repos page by page, following `rel="next"` links.
+        A fully loaded payload is taken from the shared cache, and a
+        walk that reaches the last page stores it there. Without a
+        shared cache, only the current page is held.
+        """
+        url = await self._public_repos_url()
+        cache = self.shared_cache
+        payload: Optional[List[Dict]] = None
+        if cache is not None:
+            found, payload = cache.get(url)
+            if found:
+                for repo in payload:
+                    yield repo
+                return
+            payload = []
+        next_url: Optional[str] = with_query(url, per_page=self._per_page)
+        while next_url is not None:
+            page, links = await get_json_page_async(next_url, self._session)
+            if payload is not None:
+                payload.extend(page)
+            for repo in page:
+                yield repo
+            next_url = links.get("next")
+        if cache is not None:
+            cache.set(url, payload)
+
+    async def iter_public_repos(self, license: LicenseFilter = None,
+                                **filters: Any) -> AsyncIterator[str]:
+        """Asynchronously yield public repo names, see
+        `GithubOrgClient.iter_public_repos`.
+        Pages are fetched one at a time as the caller consumes them, so
+        stopping early fetches no further pages.
+        Example
+        -------
+        >>> [name async for name in client.iter_public_repos(fork=False)]
+        """
+        keep = make_repo_filter(license, filters)
+        if self._stream:
+            repos = get_json_stream_async(await self._public_repos_url(),
+                                          self._session, self._per_page)
+            async for repo in repos:
+                if keep(repo):
+                    yield repo["name"]
+        else:
+            async for repo in self._iter_pages():
+                if keep(repo):
+                    yield repo["name"]
+
+    async def public_repos(self, license: LicenseFilter = None) -> List[str]:
+        """Public repos, see `GithubOrgClient.public_repos`"""
+        if license is None:
+            return [repo["name"] for repo in await self.repos_payload()]
+        index = await self.license_index()
+        if not instrumentation.enabled:
+            return index.names_with(license)
+        start = time.perf_counter_ns()
+        names = index.names_with(license)
+        instrumentation.observe_ns("public_repos_filter_ns",
+                                   time.perf_counter_ns() - start)
+        return names
+
+
+def _page_number(url: Optional[str]) -> Optional[int]:
+    """`page` query parameter of `url`, if any"""
+    if url is None:
+        return None
+    page = dict(parse_qsl(urlsplit(url).query)).get("page")
+    return int(page) if page and page.isdigit() else None
+
+
+async def _resolve_org(org_name: str, license: Optional[str],
+                       client_kwargs: Dict[str, Any]) -> OrgResult:
+    """Resolve the public repos of one org, capturing its error"""
+    try:
+        repos = await AsyncGithubOrgClient(
+            org_name, **client_kwargs).public_repos(license)
+    except Exception as error:
+        return OrgResult(org_name, None, error)
+    return OrgResult(org_name, repos)
+
+
+async def resolve_orgs_async(org_names: Iterable[str], license: str = None,
+                             max_in_flight: int = MAX_IN_FLIGHT,
+                             **client_kwargs: Any
+                             ) -> AsyncIterator[OrgResult]:
+    """Asyncio version of `client.resolve_orgs`.
+    Yields an `OrgResult` per org in completion order, with at most
+    `max_in_flight` orgs being resolved at once.
+    Example
+    -------
+    >>> async for result in resolve_orgs_async(names, max_in_flight=50):
+    ...     print(result.org_name, result.repos, result.error)
+    """
+    names = iter(org_names)
+    pending = set()
+    try:
+        while True:
+            for org_name in names:
+                pending.add(asyncio.ensure_future(
+                    _resolve_org(org_name, license, client_kwargs)))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
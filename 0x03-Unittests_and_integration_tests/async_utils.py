@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Asyncio counterparts of the utils used by the github org client.
+"""
+import asyncio
+import json
+import time
+import weakref
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+import aiohttp
+
+from metrics import instrumentation
+from ratelimit import PRIORITY_ORG, PRIORITY_PAGE, is_rate_limited
+from utils import (
+    RATE_LIMIT_RETRIES,
+    STREAM_CHUNK_SIZE,
+    JSONArrayParser,
+    get_rate_limiter,
+    get_request_metrics,
+    is_coalescing,
+    with_query,
+)
+
+__all__ = [
+    "MAX_CONCURRENCY",
+    "close_async_session",
+    "gather_bounded",
+    "get_async_session",
+    "get_json_async",
+    "get_json_page_async",
+    "get_json_stream_async",
+    "make_async_session",
+]
+
+MAX_CONCURRENCY = 10
+POOL_LIMIT = 32
+
+_sessions: MutableMapping[asyncio.AbstractEventLoop, aiohttp.ClientSession] \
+    = weakref.WeakKeyDictionary()
+_flights: MutableMapping[asyncio.AbstractEventLoop,
+                         Dict[Hashable, "asyncio.Task"]] \
+    = weakref.WeakKeyDictionary()
+
+
+def make_async_session(limit: int = POOL_LIMIT,
+                       limit_per_host: int = 0) -> aiohttp.ClientSession:
+    """Build a keep-alive aiohttp session over a pooled connector.
+    Must be called from a running event loop.
+    """
+    connector = aiohttp.TCPConnector(limit=limit,
+                                     limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector,
+                                 raise_for_status=False)
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Return the shared session of the running loop, creating it on
+    first use.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = make_async_session()
+    return session
+
+
+async def close_async_session() -> None:
+    """Close the shared session of the running loop"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def _send_async(session: aiohttp.ClientSession, url: str,
+                      priority: int) -> aiohttp.ClientResponse:
+    """GET `url`, through the installed rate limit scheduler if any,
+    see `utils._send`"""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return await session.get(url)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire_async(priority)
+        response = await session.get(url)
+        limiter.update(response.headers)
+        if (attempt == RATE_LIMIT_RETRIES
+                or not is_rate_limited(response.status, response.headers)):
+            break
+        response.release()
+        limiter.backoff(attempt, response.headers.get("Retry-After"))
+    return response
+
+
+async def _coalesce_async(key: Hashable,
+                          fetch: Callable[[], Awaitable]) -> Any:
+    """Await `fetch()`, or the identical fetch already in flight on the
+    running loop, see `utils._coalesce`. The shared task is shielded so
+    that a cancelled awaiter does not cancel it for the others."""
+    if not is_coalescing():
+        return await fetch()
+    flights = _flights.setdefault(asyncio.get_running_loop(), {})
+    task = flights.get(key)
+    if task is None:
+        task = flights[key] = asyncio.ensure_future(fetch())
+
+        def land(task: asyncio.Task) -> None:
+            """Forget the finished flight"""
+            if flights.get(key) is task:
+                del flights[key]
+
+        task.add_done_callback(land)
+    else:
+        get_request_metrics().incr("coalesced")
+    return await asyncio.shield(task)
+
+
+async def get_json_page_async(
+        url: str, session: Optional[aiohttp.ClientSession] = None,
+        priority: int = PRIORITY_PAGE) -> Tuple[Any, Dict[str, str]]:
+    """Get JSON from remote URL with the links of its `Link` header,
+    keyed by `rel` (e.g. "next", "last").
+    Coroutines fetching the same URL with the same session at the same
+    time share one request and its parsed body.
+    """
+    return await _coalesce_async(
+        (url, session),
+        partial(_fetch_page_async, url, session, priority))
+
+
+async def _fetch_page_async(
+        url: str, session: Optional[aiohttp.ClientSession],
+        priority: int) -> Tuple[Any, Dict[str, str]]:
+    """Send the request of `get_json_page_async`"""
+    session = session or get_async_session()
+    if instrumentation.enabled:
+        return await _fetch_page_instrumented(url, session, priority)
+    async with await _send_async(session, url, priority) as response:
+        body = await response.json(content_type=None)
+        links = {
+            str(rel): str(link["url"])
+            for rel, link in response.links.items()
+        }
+    return body, links
+
+
+async def _fetch_page_instrumented(
+        url: str, session: aiohttp.ClientSession,
+        priority: int) -> Tuple[Any, Dict[str, str]]:
+    """`_fetch_page_async` recording latency, size and decode time"""
+    start = time.perf_counter_ns()
+    async with await _send_async(session, url, priority) as response:
+        raw = await response.read()
+        instrumentation.observe_ns("request_latency_ns",
+                                   time.perf_counter_ns() - start)
+        links = {
+            str(rel): str(link["url"])
+            for rel, link in response.links.items()
+        }
+    instrumentation.count("bytes_received", len(raw))
+    start = time.perf_counter_ns()
+    body = json.loads(raw)
+    instrumentation.observe_ns("json_decode_ns",
+                               time.perf_counter_ns() - start)
+    return body, links
+
+
+async def get_json_async(
+        url: str, session: Optional[aiohttp.ClientSession] = None,
+        priority: int = PRIORITY_ORG) -> Any:
+    """Get JSON from remote URL without blocking the event loop.
+    """
+    return (await get_json_page_async(url, session, priority))[0]
+
+
+async def get_json_stream_async(
+        url: str, session: Optional[aiohttp.ClientSession] = None,
+        per_page: Optional[int] = None,
+        priority: int = PRIORITY_PAGE) -> AsyncIterator[Any]:
+    """Asyncio version of `utils.get_json_stream`: yield the items of a
+    JSON array resource as they are parsed from the response streams,
+    following `Link: rel="next"` pages.
+    """
+    session = session or get_async_session()
+    if per_page is not None:
+        url = with_query(url, per_page=per_page)
+    while url is not None:
+        async with await _send_async(session, url, priority) as response:
+            next_link = response.links.get("next")
+            url = None if next_link is None else str(next_link["url"])
+            parser = JSONArrayParser()
+            async for chunk in response.content.iter_chunked(
+                    STREAM_CHUNK_SIZE):
+                if instrumentation.enabled:
+                    instrumentation.count("bytes_received", len(chunk))
+                for item in parser.feed(chunk):
+                    yield item
+                if parser.complete:
+                    break
+            for item in parser.close():
+                yield item
+
+
+async def gather_bounded(aws: Iterable[Awaitable],
+                         limit: int = MAX_CONCURRENCY) -> List[Any]:
+    """`asyncio.gather` with at most `limit` awaitables running at once.
+    Results keep the order of `aws`.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw: Awaitable) -> Any:
+        """Run `aw` while holding the semaphore"""
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*tuple(map(bounded, aws)))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Benchmarks for the github org client.
+Run `./benchmarks.py <name> [--n N]`, or without a name to run them all.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Callable,
+    Dict,
+    List,
+)
+
+import requests
+
+import utils
+from caches import SQLiteResponseCache
+from client import GithubOrgClient, LicenseIndex, Repo
+from fixtures import TEST_PAYLOAD
+from metrics import instrumentation
+from stub_server import StubServer
+
+BENCHMARKS: Dict[str, Callable[[int], None]] = {}
+
+
+def benchmark(fn: Callable[[int], None]) -> Callable[[int], None]:
+    """Register a benchmark under its function name"""
+    BENCHMARKS[fn.__name__.replace("bench_", "")] = fn
+    return fn
+
+
+def report(label: str, seconds: float, n: int, **extra: object) -> None:
+    """Print one result line"""
+    details = " ".join("{}={}".format(k, v) for k, v in extra.items())
+    print("{:<28} {:>9.3f}s {:>9.1f}us/op {}".format(
+        label, seconds, seconds / n * 1e6, details).rstrip())
+
+
+def org_routes(n: int) -> Dict[str, Dict]:
+    """Stub routes for n orgs"""
+    return {
+        "/orgs/org{}".format(i): {"login": "org{}".format(i), "id": i}
+        for i in range(n)
+    }
+
+
+@benchmark
+def bench_session(n: int) -> None:
+    """Resolve n orgs back to back, without and with the pooled session"""
+    with StubServer(org_routes(n)) as server:
+        urls = [server.url("/orgs/org{}".format(i)) for i in range(n)]
+
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url).json()
+        report("requests.get", time.perf_counter() - start, n,
+               connections=server.connections)
+
+        server.connections = 0
+        utils.set_session(None)
+        start = time.perf_counter()
+        for url in urls:
+            utils.get_json(url)
+        report("get_json (pooled)", time.perf_counter() - start, n,
+               connections=server.connections)
+
+
+@benchmark
+def bench_coalescing(n: int) -> None:
+    """n fetches of one 5 ms org from 50 threads, without and with
+    request coalescing"""
+    def slow_org(handler) -> tuple:
+        """Answer like a remote API"""
+        time.sleep(0.005)
+        return 200, {}, b'{"login": "google"}'
+
+    with StubServer({"/orgs/google": slow_org}) as server, \
+            ThreadPoolExecutor(max_workers=50) as executor:
+        urls = [server.url("/orgs/google")] * n
+        for enabled in (False, True):
+            previous = utils.set_coalescing(enabled)
+            server.requests = 0
+            start = time.perf_counter()
+            list(executor.map(utils.get_json, urls))
+            report("coalescing={}".format(enabled),
+                   time.perf_counter() - start, n,
+                   requests=server.requests)
+            utils.set_coalescing(previous)
+
+
+@benchmark
+def bench_stale_while_revalidate(n: int) -> None:
+    """p99 latency of n reads of a 5 ms org memoized for 20 ms, with
+    blocking refetches vs stale-while-revalidate"""
+    def slow_org(handler) -> tuple:
+        """Answer like a remote API"""
+        time.sleep(0.005)
+        return 200, {}, b'{"login": "google"}'
+
+    with StubServer({"/orgs/google": slow_org}) as server:
+        url = server.url("/orgs/google")
+        for max_stale in (None, 1.0):
+            class Client:
+                """Client memoizing one org"""
+                @utils.memoize(ttl=0.02, max_stale=max_stale)
+                def org(self) -> dict:
+                    """Fetch the org"""
+                    return utils.get_json(url)
+
+            client = Client()
+            server.requests = 0
+            latencies = []
+            for _ in range(n):
+                start = time.perf_counter()
+                client.org
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.0005)
+            latencies.sort()
+            report("max_stale={}".format(max_stale), sum(latencies), n,
+                   p99="{:.0f}us".format(latencies[n * 99 // 100] * 1e6),
+                   requests=server.requests)
+
+
+@benchmark
+def bench_instrumentation(n: int) -> None:
+    """n * 100 memoized reads and n get_json calls with instrumentation
+    disabled and enabled"""
+    class Client:
+        """Client memoizing a constant"""
+        @utils.memoize
+        def org(self) -> dict:
+            """Constant org"""
+            return {"login": "google"}
+
+    client = Client()
+    with StubServer(org_routes(1)) as server:
+        url = server.url("/orgs/org0")
+        for enabled in (False, True):
+            instrumentation.reset()
+            instrumentation.enabled = enabled
+            start = time.perf_counter()
+            for _ in range(n * 100):
+                client.org
+            report("memoized reads, enabled={}".format(enabled),
+                   time.perf_counter() - start, n * 100)
+            start = time.perf_counter()
+            for _ in range(n):
+                utils.get_json(url)
+            report("get_json, enabled={}".format(enabled),
+                   time.perf_counter() - start, n)
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def org_server(n: int) -> StubServer:
+    """Stub server with n orgs, each serving the fixture repos"""
+    repos = TEST_PAYLOAD[0][1]
+    server = StubServer({})
+    for i in range(n):
+        org = "/orgs/org{}".format(i)
+        server.routes[org] = {"repos_url": server.url(org + "/repos")}
+        server.routes[org + "/repos"] = repos
+    return server
+
+
+@benchmark
+def bench_warm_start(n: int) -> None:
+    """public_repos of n orgs from a cold and a warm SQLite cache"""
+    previous = GithubOrgClient.shared_cache, GithubOrgClient.ORG_URL
+    with tempfile.TemporaryDirectory() as tmp, org_server(n) as server:
+        path = os.path.join(tmp, "cache.sqlite")
+        GithubOrgClient.ORG_URL = server.url("/orgs/{org}")
+        try:
+            for label in ("cold (network)", "warm (fresh process)"):
+                # a new cache object on the same file is what a
+                # restarted worker sees
+                GithubOrgClient.shared_cache = SQLiteResponseCache(path)
+                server.requests = 0
+                start = time.perf_counter()
+                for i in range(n):
+                    GithubOrgClient("org{}".format(i)).public_repos()
+                report(label, time.perf_counter() - start, n,
+                       requests=server.requests)
+                GithubOrgClient.shared_cache.close()
+        finally:
+            GithubOrgClient.shared_cache, GithubOrgClient.ORG_URL = previous
+
+
+LICENSES = ["apache-2.0", "mit", "bsd-3-clause", "gpl-3.0", "other"]
+
+
+def synthetic_repos(n: int) -> List[Dict]:
+    """n repo dicts shaped like the fixtures, with random licenses"""
+    template = TEST_PAYLOAD[0][1][0]
+    rng = random.Random(0)
+    repos = []
+    for i in range(n):
+        repo = dict(template, name="repo{}".format(i), id=i)
+        key = rng.choice(LICENSES + [None])
+        repo["license"] = key and dict(template["license"], key=key)
+        repos.append(repo)
+    return repos
+
+
+@benchmark
+def bench_license_index(n: int) -> None:
+    """Repeated license queries over n repos: rescan vs LicenseIndex"""
+    repos = synthetic_repos(n * 50)
+    queries = LICENSES * 4
+
+    start = time.perf_counter()
+    for key in queries:
+        [repo["name"] for repo in repos
+         if GithubOrgClient.has_license(repo, key)]
+    report("has_license rescans", time.perf_counter() - start,
+           len(queries), repos=len(repos))
+
+    start = time.perf_counter()
+    index = LicenseIndex(repos)
+    built = time.perf_counter() - start
+    for key in queries:
+        index.names_with(key)
+    report("LicenseIndex", time.perf_counter() - start, len(queries),
+           build="{:.3f}s".format(built))
+
+    start = time.perf_counter()
+    for _ in queries:
+        index.names_with(LICENSES[:3])
+    report("LicenseIndex (3 licenses)", time.perf_counter() - start,
+           len(queries))
+
+
+@benchmark
+def bench_compile_path(n: int) -> None:
+    """license.key of n * 50 repos: access_nested_map vs compile_path"""
+    repos = synthetic_repos(n * 50)
+    path = ("license", "key")
+
+    start = time.perf_counter()
+    for repo in repos:
+        try:
+            utils.access_nested_map(repo, path)
+        except KeyError:
+            pass
+    report("access_nested_map", time.perf_counter() - start, len(repos))
+
+    getter = utils.compile_path(path)
+    start = time.perf_counter()
+    for repo in repos:
+        try:
+            getter(repo)
+        except KeyError:
+            pass
+    report("compile_path", time.perf_counter() - start, len(repos))
+
+    getter = utils.compile_path(path, default=None)
+    start = time.perf_counter()
+    for repo in repos:
+        getter(repo)
+    report("compile_path(default=None)", time.perf_counter() - start,
+           len(repos))
+
+
+@benchmark
+def bench_repo_records(n: int) -> None:
+    """Memory of the fixture repos scaled n times: dicts vs Repo records
+    """
+    texts = [json.dumps(repo) for repo in TEST_PAYLOAD[0][1]]
+    count = len(texts) * n
+    gc.collect()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    repos = [json.loads(text) for _ in range(n) for text in texts]
+    parsed = time.perf_counter() - start
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    report("JSON dicts", parsed, count,
+           MiB="{:.1f}".format(dict_bytes / 2 ** 20))
+
+    start = time.perf_counter()
+    records = list(map(Repo.from_payload, repos))
+    projected = time.perf_counter() - start
+    del repos
+    gc.collect()
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report("Repo records", projected, count,
+           MiB="{:.1f}".format(record_bytes / 2 ** 20),
+           ratio="{:.1f}x".format(dict_bytes / record_bytes))
+    del records
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help="one of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--n", type=int, default=2000)
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmark: " + ", ".join(sorted(unknown)))
+    for name in args.names or BENCHMARKS:
+        print("== {}".format(name))
+        BENCHMARKS[name](args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Cache backends used by utils.get_json.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = [
+    "DiskValidatorCache",
+    "MemoryResponseCache",
+    "MemoryValidatorCache",
+    "ResponseCache",
+    "SQLiteResponseCache",
+    "ValidatorCache",
+]
+
+
+class ValidatorCache:
+    """Base class of HTTP validator caches.
+    An entry holds the `ETag`/`Last-Modified` validators of a URL and
+    its parsed body. Backends implement `_load` and `_save`; the base
+    class keeps the counters:
+    misses
+        requests sent without validators (nothing cached for the URL)
+    revalidations
+        conditional requests sent
+    hits
+        conditional requests answered with 304 Not Modified
+    """
+
+    def __init__(self) -> None:
+        """Init method of ValidatorCache"""
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry of `url`"""
+        raise NotImplementedError
+
+    def _save(self, url: str, entry: Dict[str, Any]) -> None:
+        """Store the entry of `url`"""
+        raise NotImplementedError
+
+    def _count(self, counter: str) -> None:
+        """Increment a counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for `url`, empty if unknown"""
+        entry = self._load(url)
+        if entry is None:
+            self._count("misses")
+            return {}
+        self._count("revalidations")
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, url: str) -> Dict[str, Any]:
+        """Cached entry of `url` after a 304 answer, with its `body` and
+        `link` header"""
+        entry = self._load(url)
+        if entry is None:
+            raise KeyError(url)
+        self._count("hits")
+        return entry
+
+    def store(self, url: str, headers: Mapping[str, str], body: Any) -> None:
+        """Remember `body` if the response carries validators"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag or last_modified:
+            self._save(url, {"etag": etag, "last_modified": last_modified,
+                             "link": headers.get("Link"), "body": body})
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the counters"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "revalidations": self.revalidations}
+
+
+class MemoryValidatorCache(ValidatorCache):
+    """Validator cache kept in a dict.
+    Bodies are returned as stored, so callers must not mutate them.
+    """
+
+    def __init__(self) -> None:
+        """Init method of MemoryValidatorCache"""
+        super().__init__()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry of `url`"""
+        return self._entries.get(url)
+
+    def _save(self, url: str, entry: Dict[str, Any]) -> None:
+        """Store the entry of `url`"""
+        self._entries[url] = entry
+
+    def __len__(self) -> int:
+        """Number of cached URLs"""
+        return len(self._entries)
+
+
+class DiskValidatorCache(ValidatorCache):
+    """Validator cache with one JSON file per URL under `directory`.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Init method of DiskValidatorCache"""
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        """File holding the entry of `url`"""
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry of `url`"""
+        try:
+            with open(self._path(url), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, url: str, entry: Dict[str, Any]) -> None:
+        """Store the entry of `url`, atomically replacing the old one"""
+        path = self._path(url)
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, path)
+
+
+class ResponseCache:
+    """Base class of caches shared by every client instance.
+    Values are kept for `ttl` seconds (forever when None). Backends
+    implement `_load`, `_save`, `clear` and `__len__`; the base class
+    keeps the hit and miss counters.
+    """
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        """Init method of ResponseCache"""
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, key: Hashable) -> Optional[Tuple[Any, Optional[float]]]:
+        """Return the stored (value, expiry time) of `key`"""
+        raise NotImplementedError
+
+    def _save(self, key: Hashable, value: Any,
+              expires: Optional[float]) -> None:
+        """Store `value` under `key` until `expires`"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """Number of stored entries"""
+        raise NotImplementedError
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(True, value) if `key` holds an unexpired value"""
+        entry = self._load(key)
+        found = entry is not None and (entry[1] is None
+                                       or entry[1] > time.time())
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (True, entry[0]) if found else (False, None)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store `value` under `key`"""
+        expires = None if self.ttl is None else time.time() + self.ttl
+        self._save(key, value, expires)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Value of `key`, stored from `factory()` on a miss"""
+        found, value = self.get(key)
+        if not found:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of size and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self), "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+class MemoryResponseCache(ResponseCache):
+    """Thread-safe LRU response cache bounded to `maxsize` entries.
+    Values are shared, callers must not mutate them.
+    """
+
+    def __init__(self, maxsize: int = 1024,
+                 ttl: Optional[float] = None) -> None:
+        """Init method of MemoryResponseCache"""
+        super().__init__(ttl)
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" \
+            = OrderedDict()
+
+    def _load(self, key: Hashable) -> Optional[Tuple[Any, Optional[float]]]:
+        """Return the stored (value, expiry time) of `key`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _save(self, key: Hashable, value: Any,
+              expires: Optional[float]) -> None:
+        """Store `value` under `key`, evicting the least recently used"""
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        """Number of stored entries"""
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of size, hit ratio and evictions"""
+        with self._lock:
+            return dict(super().stats(), maxsize=self.maxsize,
+                        evictions=self.evictions)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Response cache persisted in an SQLite database at `path`.
+    Entries survive restarts, so a fresh process answers from disk
+    what an earlier one fetched. Keys are URLs and values are stored as
+    JSON; lazily loaded sequences such as `utils.PagedList` are loaded
+    completely and stored as lists.
+    Example
+    -------
+    >>> GithubOrgClient.shared_cache = SQLiteResponseCache(
+    ...     "github.sqlite", ttl=3600)
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None) -> None:
+        """Init method of SQLiteResponseCache"""
+        super().__init__(ttl)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+
+    def _load(self, key: Hashable) -> Optional[Tuple[Any, Optional[float]]]:
+        """Return the stored (value, expiry time) of `key`"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM responses WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _save(self, key: Hashable, value: Any,
+              expires: Optional[float]) -> None:
+        """Store `value` under `key` until `expires`"""
+        data = json.dumps(value, default=list)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, data, expires))
+
+    def purge(self) -> int:
+        """Delete expired entries and return how many were deleted"""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM responses WHERE expires <= ?",
+                (time.time(),)).rowcount
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self.hits = self.misses = 0
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        """Number of stored entries, expired ones included"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0]
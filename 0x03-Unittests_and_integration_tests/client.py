@@ -1,58 +1,402 @@
 #!/usr/bin/env python3
 """A github org client
 """
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain
+from operator import attrgetter, itemgetter
 from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
     List,
     Dict,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
 )
 
+from caches import MemoryResponseCache, ResponseCache
+from metrics import instrumentation
 from utils import (
+    PagedList,
     get_json,
-    access_nested_map,
+    get_json_page,
+    get_json_stream,
+    compile_path,
     memoize,
 )
 
 
+CACHE_TTL = 300
+CACHE_MAXSIZE = 1024
+# seconds an expired org or payload is served while it is refetched
+CACHE_MAX_STALE = 60
+
+
+class _NoLicense:
+    """Type of the NO_LICENSE filter"""
+
+    def __repr__(self) -> str:
+        """Readable name"""
+        return "NO_LICENSE"
+
+
+NO_LICENSE = _NoLicense()
+_license_key = compile_path(("license", "key"), default=None)
+
+REPO_FIELDS: Dict[str, Sequence[str]] = {
+    "name": ("name",),
+    "license_key": ("license", "key"),
+    "owner_login": ("owner", "login"),
+    "language": ("language",),
+    "fork": ("fork",),
+    "forks": ("forks",),
+    "watchers": ("watchers",),
+}
+INTERNED_FIELDS = frozenset(("license_key", "owner_login", "language"))
+
+
+def make_repo_record(fields: Dict[str, Sequence[str]] = REPO_FIELDS,
+                     interned: Iterable[str] = INTERNED_FIELDS,
+                     typename: str = "Repo") -> type:
+    """Build a compact record type holding only `fields` of a repo.
+    `fields` maps attribute names to key paths in the repo payload and
+    must include "name" and "license_key". Records are slotted tuples;
+    the string values of `interned` fields are interned so that the
+    many repos sharing a license or owner share one string.
+    Example
+    -------
+    >>> Repo = make_repo_record()
+    >>> Repo.from_payload(repo_dict).license_key
+    'apache-2.0'
+    """
+    missing = {"name", "license_key"} - set(fields)
+    if missing:
+        raise ValueError("record fields must include: {}".format(
+            ", ".join(sorted(missing))))
+    getters = tuple(
+        (compile_path(path, default=None), field in interned)
+        for field, path in fields.items()
+    )
+
+    intern_flags = tuple(intern for _, intern in getters)
+
+    def from_payload(cls, repo: Dict) -> Any:
+        """Project a repo payload dict into a record"""
+        values = []
+        for getter, intern in getters:
+            value = getter(repo)
+            if intern and type(value) is str:
+                value = sys.intern(value)
+            values.append(value)
+        return tuple.__new__(cls, values)
+
+    def from_values(cls, values: Iterable[Any]) -> Any:
+        """Rebuild a record from its field values, e.g. loaded back
+        from JSON, interning them like from_payload"""
+        values = list(values)
+        if len(values) != len(intern_flags):
+            raise TypeError("expected {} values, got {}".format(
+                len(intern_flags), len(values)))
+        return tuple.__new__(cls, [
+            sys.intern(value) if intern and type(value) is str else value
+            for value, intern in zip(values, intern_flags)])
+
+    return type(typename, (namedtuple(typename, fields),), {
+        "__slots__": (),
+        "paths": dict(fields),
+        "from_payload": classmethod(from_payload),
+        "from_values": classmethod(from_values),
+    })
+
+
+Repo = make_repo_record()
+
+LicenseFilter = Union[str, _NoLicense, Iterable[Union[str, _NoLicense]]]
+
+
+def _license_keys(license: LicenseFilter) -> frozenset:
+    """License keys selected by a license filter"""
+    if isinstance(license, (str, _NoLicense)):
+        return frozenset((license,))
+    return frozenset(license)
+
+
+def make_repo_filter(license: Optional[LicenseFilter],
+                     filters: Dict[str, Any],
+                     record_type: Optional[type] = None
+                     ) -> Callable[[Any], bool]:
+    """Predicate selecting repos by license and by field `filters`.
+    A filter value is either compared for equality or, if callable,
+    called with the field value. Fields are read from `record_type`
+    records, or from payload dicts where REPO_FIELDS names map to their
+    key paths and other names to top-level keys.
+    """
+    checks = []
+    if license is not None:
+        keys = _license_keys(license)
+        license_of = (_license_key if record_type is None
+                      else attrgetter("license_key"))
+        checks.append(lambda repo: (license_of(repo) or NO_LICENSE) in keys)
+    for field, expected in filters.items():
+        if record_type is None:
+            getter = compile_path(REPO_FIELDS.get(field, (field,)), None)
+        elif field in record_type._fields:
+            getter = attrgetter(field)
+        else:
+            raise ValueError("{} has no field {!r}".format(
+                record_type.__name__, field))
+        if callable(expected):
+            checks.append(lambda repo, get=getter, test=expected:
+                          test(get(repo)))
+        else:
+            checks.append(lambda repo, get=getter, value=expected:
+                          get(repo) == value)
+    return lambda repo: all(check(repo) for check in checks)
+
+
+class LicenseIndex:
+    """Repo names of a repos payload grouped by license key.
+    Built in one pass; repos without a license are filed under
+    NO_LICENSE. Lookups return names in payload order. `name_of` and
+    `license_of` read a repo, payload dicts by default.
+    """
+
+    def __init__(self, repos: Iterable[Any],
+                 name_of: Callable[[Any], str] = itemgetter("name"),
+                 license_of: Callable[[Any], Optional[str]] = _license_key
+                 ) -> None:
+        """Init method of LicenseIndex"""
+        self.names: List[str] = []
+        self._positions: Dict[Any, List[int]] = {}
+        for position, repo in enumerate(repos):
+            self.names.append(name_of(repo))
+            key = license_of(repo) or NO_LICENSE
+            self._positions.setdefault(key, []).append(position)
+
+    def licenses(self) -> List[Any]:
+        """License keys present in the payload"""
+        return list(self._positions)
+
+    def names_with(self, license: LicenseFilter) -> List[str]:
+        """Names of the repos under `license`, NO_LICENSE or any key of
+        an iterable of them"""
+        keys = _license_keys(license)
+        if len(keys) == 1:
+            positions: Iterable[int] = self._positions.get(next(iter(keys)),
+                                                           ())
+        else:
+            # each list is already sorted: timsort merges the runs
+            positions = sorted(chain.from_iterable(
+                self._positions.get(key, ()) for key in keys))
+        names = self.names
+        return [names[position] for position in positions]
+
+
 class GithubOrgClient:
     """A Githib org client
+    Org and repos payloads are looked up by URL in `shared_cache`,
+    shared by every instance, before being fetched; set it to None to
+    disable sharing. `org` and `repos_payload` expire after CACHE_TTL
+    seconds and are then served stale for up to CACHE_MAX_STALE
+    seconds while they are refetched in the background.
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    PER_PAGE = 100
+    shared_cache: Optional[ResponseCache] = MemoryResponseCache(
+        maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
 
-    def __init__(self, org_name: str) -> None:
-        """Init method of GithubOrgClient"""
+    def __init__(self, org_name: str, per_page: int = PER_PAGE,
+                 prefetch: bool = False,
+                 record_type: Optional[type] = None,
+                 stream: bool = False) -> None:
+        """Init method of GithubOrgClient.
+        `per_page` is the repos page size (GitHub caps it at 100) and
+        `prefetch` fetches the next repos page while the current one is
+        being consumed. With a `record_type` from `make_repo_record`
+        (e.g. `Repo`), repos_payload holds compact records instead of
+        the raw JSON dicts.
+        With `stream`, public_repos parses repos one at a time from the
+        response bodies without keeping them, in bounded memory.
+        """
         self._org_name = org_name
+        self._per_page = per_page
+        self._prefetch = prefetch
+        self._record_type = record_type
+        self._stream = stream
+        if record_type is None:
+            self._name_of = itemgetter("name")
+            self._license_of = _license_key
+        else:
+            self._name_of = attrgetter("name")
+            self._license_of = attrgetter("license_key")
+
+    def _shared(self, url: str, fetch: Callable[[str], Any]) -> Any:
+        """`fetch(url)` through the shared cache"""
+        if self.shared_cache is None:
+            return fetch(url)
+        return self.shared_cache.get_or_set(url, lambda: fetch(url))
 
-    @memoize
+    @memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE,
+             max_stale=CACHE_MAX_STALE)
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        return self._shared(self.ORG_URL.format(org=self._org_name),
+                            get_json)
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
-    @memoize
-    def repos_payload(self) -> Dict:
-        """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+    @memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE,
+             max_stale=CACHE_MAX_STALE)
+    def repos_payload(self) -> PagedList:
+        """Memoize repos payload, following `Link: rel="next"` pages"""
+        url = self._public_repos_url
+        if self._record_type is None:
+            return self._shared(url, lambda url: PagedList(
+                url, per_page=self._per_page, prefetch=self._prefetch,
+                fetch=get_json_page))
+        record_type = self._record_type
+        payload = self._shared(
+            "{}#{}".format(url, record_type.__name__),
+            lambda key: PagedList(
+                url, per_page=self._per_page, prefetch=self._prefetch,
+                fetch=get_json_page, transform=record_type.from_payload))
+        if isinstance(payload, PagedList):
+            return payload
+        # Persistent caches hand records back as JSON arrays
+        return [repo if isinstance(repo, record_type)
+                else record_type.from_values(repo) for repo in payload]
+
+    @memoize(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE)
+    def _indexed_payload(self) -> Tuple[Any, LicenseIndex]:
+        """Memoize the repos payload with its license index"""
+        payload = self.repos_payload
+        return payload, LicenseIndex(payload, self._name_of,
+                                     self._license_of)
+
+    @property
+    def license_index(self) -> LicenseIndex:
+        """License index of the current repos payload, built on first
+        use and rebuilt when the payload is refetched"""
+        payload = self.repos_payload
+        indexed = self._indexed_payload
+        if indexed[0] is not payload:
+            indexed = type(self)._indexed_payload.refresh(self)
+        return indexed[1]
 
-    def public_repos(self, license: str = None) -> List[str]:
-        """Public repos"""
-        json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+    def _stream_repos(self) -> Iterator[Any]:
+        """Repos parsed one by one from the response streams"""
+        repos = get_json_stream(self._public_repos_url,
+                                per_page=self._per_page)
+        if self._record_type is not None:
+            repos = map(self._record_type.from_payload, repos)
+        return repos
 
-        return public_repos
+    def iter_public_repos(self, license: LicenseFilter = None,
+                          **filters: Any) -> Iterator[str]:
+        """Lazily yield public repo names.
+        Repos are read as pages (or, in stream mode, items) arrive, so
+        the first names come before the last page is fetched and a
+        caller stopping early fetches no further pages. `license` is as
+        for `public_repos`; `filters` select on other fields, e.g.
+        `fork=False` or `forks=lambda forks: forks > 10`.
+        Example
+        -------
+        >>> from itertools import islice
+        >>> list(islice(client.iter_public_repos("mit", fork=False), 5))
+        """
+        keep = make_repo_filter(license, filters, self._record_type)
+        repos = self._stream_repos() if self._stream else self.repos_payload
+        name_of = self._name_of
+        for repo in repos:
+            if keep(repo):
+                yield name_of(repo)
+
+    def public_repos(self, license: LicenseFilter = None) -> List[str]:
+        """Public repos.
+        `license` is a license key, NO_LICENSE or an iterable of them;
+        filtered queries are answered from `license_index`, or checked
+        repo by repo in stream mode.
+        """
+        if self._stream:
+            return list(self.iter_public_repos(license))
+        if license is None:
+            return list(map(self._name_of, self.repos_payload))
+        index = self.license_index
+        if not instrumentation.enabled:
+            return index.names_with(license)
+        start = time.perf_counter_ns()
+        names = index.names_with(license)
+        instrumentation.observe_ns("public_repos_filter_ns",
+                                   time.perf_counter_ns() - start)
+        return names
 
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
+        return _license_key(repo) == license_key
+
+
+class OrgResult(NamedTuple):
+    """Outcome of resolving one org in a batch"""
+    org_name: str
+    repos: Optional[List[str]]
+    error: Optional[BaseException] = None
+
+
+MAX_IN_FLIGHT = 8
+
+
+def _resolve_org(org_name: str, license: Optional[str],
+                 client_kwargs: Dict[str, Any]) -> OrgResult:
+    """Resolve the public repos of one org, capturing its error"""
+    try:
+        repos = GithubOrgClient(org_name, **client_kwargs).public_repos(
+            license)
+    except Exception as error:
+        return OrgResult(org_name, None, error)
+    return OrgResult(org_name, repos)
+
+
+def resolve_orgs(org_names: Iterable[str], license: str = None,
+                 max_in_flight: int = MAX_IN_FLIGHT,
+                 **client_kwargs: Any) -> Iterator[OrgResult]:
+    """Resolve the public repos of many orgs concurrently.
+    Each org's repos fetch starts as soon as its own org payload
+    arrives, at most `max_in_flight` orgs are resolved at once and
+    results are yielded in completion order. A failing org yields an
+    `OrgResult` carrying its error instead of stopping the batch.
+    `client_kwargs` are passed to each GithubOrgClient.
+    Example
+    -------
+    >>> for result in resolve_orgs(["google", "abc"], max_in_flight=4):
+    ...     print(result.org_name, result.repos, result.error)
+    """
+    names = iter(org_names)
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
         try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
-        except KeyError:
-            return False
-        return has_license
+            while True:
+                for org_name in names:
+                    pending.add(executor.submit(
+                        _resolve_org, org_name, license, client_kwargs))
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
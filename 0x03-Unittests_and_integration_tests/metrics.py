@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Request metrics for the github org client.
+"""
+import math
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+__all__ = [
+    "DURATION_BUCKETS_NS",
+    "Instrumentation",
+    "LATENCY_BUCKETS",
+    "LatencyHistogram",
+    "RequestMetrics",
+    "instrumentation",
+    "request_metrics",
+]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, math.inf)
+DURATION_BUCKETS_NS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8,
+                       5e8, 1e9, 2.5e9, 1e10, math.inf)
+RESERVOIR_SIZE = 1024
+
+Labels = Tuple[Tuple[str, str], ...]
+Hook = Callable[[str, float, Dict[str, str]], None]
+
+
+class LatencyHistogram:
+    """Latency distribution in seconds.
+    Keeps cumulative bucket counts (Prometheus style `le` bounds) and
+    the last RESERVOIR_SIZE samples for quantiles.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Init method of LatencyHistogram"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._recent: Deque[float] = deque(maxlen=RESERVOIR_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Record one latency"""
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self._recent.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """`q` quantile (0..1) of the recent samples, None if empty"""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def __len__(self) -> int:
+        """Number of recent samples"""
+        return len(self._recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts, sum, cumulative buckets and common quantiles"""
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                cumulative[bound] = total
+            snapshot = {"count": self.count, "sum": self.sum,
+                        "buckets": cumulative}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            snapshot[name] = self.quantile(q)
+        return snapshot
+
+
+class RequestMetrics:
+    """Counters and latency of the requests sent by `utils.get_json`.
+    Counters: requests (attempts sent), retries, failures (attempts
+    ending in a connection error or timeout), hedges (duplicate
+    requests fired), hedge_wins (duplicates answering first) and
+    coalesced (fetches served by an identical one in flight).
+    """
+    COUNTERS = ("requests", "retries", "failures", "hedges", "hedge_wins",
+                "coalesced")
+
+    def __init__(self) -> None:
+        """Init method of RequestMetrics"""
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.latency = LatencyHistogram()
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and latency histogram"""
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self.counters)
+        snapshot["latency"] = self.latency.snapshot()
+        return snapshot
+
+    def reset(self) -> None:
+        """Zero every counter and forget the latencies"""
+        with self._lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.latency = LatencyHistogram()
+
+
+request_metrics = RequestMetrics()
+
+
+def _series(name: str, labels: Labels, extra: str = "") -> str:
+    """Prometheus series name with its labels"""
+    pairs = ['{}="{}"'.format(key, value.replace("\\", "\\\\")
+                              .replace('"', '\\"').replace("\n", "\\n"))
+             for key, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{}{{{}}}".format(name, ",".join(pairs)) if pairs else name
+
+
+def _number(value: float) -> str:
+    """Prometheus sample value"""
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Instrumentation:
+    """Opt-in counters and timings of the client's hot path.
+    Instrumented code checks `enabled` before reading the clock, so a
+    disabled registry (the default) costs one attribute lookup per
+    call site. Durations are nanoseconds from `time.perf_counter_ns`.
+    Recorded series:
+    - request_latency_ns, bytes_received and json_decode_ns from the
+      `utils` and `async_utils` fetches;
+    - memoize_hits, memoize_stale and memoize_misses, labelled with
+      the memoized `method`;
+    - public_repos_filter_ns from the org clients.
+    Hooks are called with (name, value, labels) for every record.
+    Example
+    -------
+    >>> instrumentation.enable()
+    >>> client.public_repos("mit")
+    >>> print(instrumentation.to_prometheus())
+    """
+
+    def __init__(self, namespace: str = "github_client") -> None:
+        """Init method of Instrumentation"""
+        self.namespace = namespace
+        self.enabled = False
+        self._hooks: List[Hook] = []
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.timings: Dict[Tuple[str, Labels], LatencyHistogram] = {}
+
+    def enable(self) -> None:
+        """Start recording"""
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Stop recording, keeping what was recorded"""
+        self.enabled = False
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call `hook(name, value, labels)` on every record"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Stop calling `hook`"""
+        self._hooks.remove(hook)
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add `value` to the counter `name`"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for hook in self._hooks:
+            hook(name, value, labels)
+
+    def observe_ns(self, name: str, nanoseconds: int,
+                   **labels: str) -> None:
+        """Record a duration in the timing `name`"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.timings.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.timings.setdefault(
+                    key, LatencyHistogram(DURATION_BUCKETS_NS))
+        histogram.observe(nanoseconds)
+        for hook in self._hooks:
+            hook(name, nanoseconds, labels)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters and timing histograms keyed by series name"""
+        with self._lock:
+            counters = list(self.counters.items())
+            timings = list(self.timings.items())
+        return {
+            "counters": {_series(name, labels): value
+                         for (name, labels), value in counters},
+            "timings": {_series(name, labels): histogram.snapshot()
+                        for (name, labels), histogram in timings},
+        }
+
+    def to_prometheus(self) -> str:
+        """Everything recorded, in the Prometheus text format"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+        lines: List[str] = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = "{}_{}_total".format(self.namespace, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE {} counter".format(metric))
+            lines.append("{} {}".format(_series(metric, labels),
+                                        _number(value)))
+        for (name, labels), histogram in timings:
+            metric = "{}_{}".format(self.namespace, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE {} histogram".format(metric))
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                lines.append("{} {}".format(
+                    _series(metric + "_bucket", labels,
+                            'le="{}"'.format(_number(bound))), count))
+            lines.append("{} {}".format(_series(metric + "_sum", labels),
+                                        _number(snapshot["sum"])))
+            lines.append("{} {}".format(_series(metric + "_count", labels),
+                                        snapshot["count"]))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self) -> None:
+        """Forget everything recorded"""
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+instrumentation = Instrumentation()
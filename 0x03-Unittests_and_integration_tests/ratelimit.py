@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Rate-limit-aware request scheduling for the github org client.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = [
+    "PRIORITY_ORG",
+    "PRIORITY_PAGE",
+    "RateLimitScheduler",
+    "is_rate_limited",
+]
+
+PRIORITY_ORG = 0
+PRIORITY_PAGE = 10
+
+# GitHub's authenticated REST budget
+DEFAULT_RATE = 5000 / 3600
+DEFAULT_BURST = 20
+ASYNC_POLL_INTERVAL = 0.05
+
+
+def is_rate_limited(status_code: int, headers: Mapping[str, str]) -> bool:
+    """True for a 429, or a 403 caused by an exhausted rate limit"""
+    if status_code == 429:
+        return True
+    return status_code == 403 and (
+        headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in headers)
+
+
+class RateLimitScheduler:
+    """Token bucket shared by threads and coroutines.
+    Requests take a token before being sent. Tokens refill at `rate`
+    per second up to `burst`; `update` re-paces the bucket from the
+    `X-RateLimit-Remaining`/`X-RateLimit-Reset` headers of each
+    response, spreading the remaining budget until the reset and
+    pausing everyone when it is exhausted. Waiting requests are served
+    by priority (lower first, e.g. PRIORITY_ORG before PRIORITY_PAGE),
+    then in arrival order. Rate limited answers (`backoff`) pause
+    everyone for `Retry-After` or an exponential backoff. Waits are
+    stretched by up to `jitter` of their length so that waiters do not
+    wake in lockstep.
+    Example
+    -------
+    >>> utils.set_rate_limiter(RateLimitScheduler())
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE,
+                 burst: int = DEFAULT_BURST, jitter: float = 0.1,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0) -> None:
+        """Init method of RateLimitScheduler"""
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _jittered(self, delay: float) -> float:
+        """`delay` stretched by a random share of `jitter`"""
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        """Queue a waiter and return its ticket"""
+        ticket = (priority, next(self._tickets))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        """Remove an abandoned ticket"""
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._cond.notify_all()
+
+    def _try_take(self, ticket: Tuple[int, int]) -> Optional[float]:
+        """Take a token for `ticket` if it is its turn and one is
+        available; otherwise return how long to wait"""
+        now = time.monotonic()
+        if self._blocked_until:
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            # the pause ends with a fresh budget
+            self._blocked_until = 0.0
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(self.burst, self._tokens
+                               + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        if self._waiters[0] != ticket:
+            return ASYNC_POLL_INTERVAL
+        self._tokens -= 1
+        heapq.heappop(self._waiters)
+        self.acquired += 1
+        self._cond.notify_all()
+        return None
+
+    def acquire(self, priority: int = PRIORITY_ORG) -> None:
+        """Block the calling thread until a request may be sent"""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    delay = self._try_take(ticket)
+                    if delay is None:
+                        break
+                    self._cond.wait(self._jittered(delay))
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+            self.waited += time.monotonic() - start
+
+    async def acquire_async(self, priority: int = PRIORITY_ORG) -> None:
+        """Wait, without blocking the event loop, until a request may
+        be sent"""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(ticket)
+                if delay is None:
+                    break
+                await asyncio.sleep(min(self._jittered(delay),
+                                        ASYNC_POLL_INTERVAL))
+        except BaseException:
+            with self._cond:
+                self._dequeue(ticket)
+            raise
+        with self._cond:
+            self.waited += time.monotonic() - start
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Re-pace the bucket from GitHub's rate limit headers"""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        window = max(reset - time.time(), 0.0)
+        with self._cond:
+            if remaining <= 0:
+                self._tokens = 0.0
+                self._blocked_until = max(
+                    self._blocked_until,
+                    time.monotonic() + self._jittered(window))
+            else:
+                self._tokens = min(self._tokens, float(remaining))
+                self.rate = remaining / max(window, 1.0)
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int,
+                retry_after: Optional[str] = None) -> None:
+        """Pause every request after a rate limited answer, for
+        `Retry-After` seconds or an exponential backoff"""
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        with self._cond:
+            self.throttled += 1
+            self._tokens = 0.0
+            self._blocked_until = max(
+                self._blocked_until,
+                time.monotonic() + self._jittered(delay))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the scheduler state"""
+        with self._cond:
+            return {"acquired": self.acquired, "throttled": self.throttled,
+                    "waited": self.waited, "queued": len(self._waiters),
+                    "rate": self.rate}
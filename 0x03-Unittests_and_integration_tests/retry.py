@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Retries, timeouts and hedged requests for the github org client.
+"""
+import random
+from metrics import RequestMetrics, request_metrics
+from typing import (
+    Collection,
+    Optional,
+    Tuple,
+    Union,
+)
+
+__all__ = [
+    "RETRY_STATUSES",
+    "RetryPolicy",
+]
+
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+# latencies observed before `hedge_quantile` replaces `hedge_after`
+HEDGE_MIN_SAMPLES = 20
+# latencies observed between two computations of the hedge quantile
+HEDGE_REFRESH_SAMPLES = 64
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class RetryPolicy:
+    """How `utils.get_json` retries, times out and hedges requests.
+    Answers with a status in `statuses`, connection errors and
+    timeouts are retried up to `retries` times, after an exponential
+    backoff (`backoff_base * 2 ** attempt`, capped at `backoff_max`)
+    shortened by up to `jitter` of its length. `timeout` is passed to
+    requests as is: seconds, or a (connect, read) tuple.
+    A request still unanswered after `hedge_after` seconds is sent a
+    second time and the first answer wins. With `hedge_quantile`
+    (e.g. 0.95) the delay follows that quantile of the observed
+    latencies once HEDGE_MIN_SAMPLES are known, recomputed every
+    HEDGE_REFRESH_SAMPLES latencies rather than on every request.
+    Retries, hedges and latencies are recorded in `metrics`.
+    Example
+    -------
+    >>> utils.set_retry_policy(RetryPolicy(timeout=(3.05, 10),
+    ...                                    hedge_quantile=0.95))
+    """
+
+    def __init__(self, retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, jitter: float = 0.5,
+                 timeout: Optional[Timeout] = None,
+                 hedge_after: Optional[float] = None,
+                 hedge_quantile: Optional[float] = None,
+                 statuses: Collection[int] = RETRY_STATUSES,
+                 metrics: Optional[RequestMetrics] = None) -> None:
+        """Init method of RetryPolicy"""
+        if retries < 0:
+            raise ValueError("retries must be >= 0")
+        if hedge_quantile is not None and not 0 < hedge_quantile < 1:
+            raise ValueError("hedge_quantile must be in (0, 1)")
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.statuses = frozenset(statuses)
+        self.metrics = request_metrics if metrics is None else metrics
+        # (latency count, quantile) of the last hedge quantile computed
+        self._hedge_quantile: Optional[Tuple[int, Optional[float]]] = None
+
+    def should_retry(self, status_code: int) -> bool:
+        """True when an answer with `status_code` is worth retrying"""
+        return status_code in self.statuses
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retrying after failed `attempt`"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * (1 - random.uniform(0, self.jitter))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which to hedge a request, None to never hedge"""
+        latency = self.metrics.latency
+        if (self.hedge_quantile is None
+                or len(latency) < HEDGE_MIN_SAMPLES):
+            return self.hedge_after
+        cached, count = self._hedge_quantile, latency.count
+        if cached is None or count - cached[0] >= HEDGE_REFRESH_SAMPLES:
+            cached = self._hedge_quantile = (
+                count, latency.quantile(self.hedge_quantile))
+        return cached[1]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""A local stub HTTP server for tests and benchmarks.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Tuple,
+    Union,
+)
+
+Reply = Tuple[int, Dict[str, str], bytes]
+Route = Union[Any, Callable[["StubHandler"], Reply]]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves the routes of the owning StubServer with keep-alive."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        """Answer a GET from the route table"""
+        self.server.stub.record(self)
+        path = self.path.split("?", 1)[0]
+        route = self.server.stub.routes.get(path)
+        if route is None:
+            status, headers, body = 404, {}, b'{"message": "Not Found"}'
+        elif callable(route):
+            status, headers, body = route(self)
+        else:
+            status, headers, body = 200, {}, json.dumps(route).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep the stub quiet"""
+
+
+class _Server(ThreadingHTTPServer):
+    """ThreadingHTTPServer counting accepted connections."""
+    daemon_threads = True
+
+    def get_request(self):
+        """Count each accepted TCP connection"""
+        request = super().get_request()
+        with self.stub.lock:
+            self.stub.connections += 1
+        return request
+
+
+def paged_route(items: list, default_per_page: int = 30
+                ) -> Callable[[StubHandler], Reply]:
+    """Route serving `items` in pages with GitHub style `Link` headers,
+    honouring the `page` and `per_page` query parameters."""
+    def route(handler: StubHandler) -> Reply:
+        """Answer one page"""
+        path, _, query = handler.path.partition("?")
+        params = dict(parse_qsl(query))
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", default_per_page))
+        headers = {}
+        if page * per_page < len(items):
+            url = "http://{}{}?".format(handler.headers["Host"], path)
+            last = (len(items) + per_page - 1) // per_page
+            headers["Link"] = '<{}{}>; rel="next", <{}{}>; rel="last"'.format(
+                url, urlencode(dict(params, page=page + 1)),
+                url, urlencode(dict(params, page=last)))
+        body = items[(page - 1) * per_page:page * per_page]
+        return 200, headers, json.dumps(body).encode()
+    return route
+
+
+class StubServer:
+    """Serve `routes` (path -> JSON payload or handler callable) on
+    localhost in a background thread.
+    Example
+    -------
+    >>> with StubServer({"/orgs/google": {"login": "google"}}) as server:
+    ...     get_json(server.url("/orgs/google"))
+    {'login': 'google'}
+    """
+
+    def __init__(self, routes: Mapping[str, Route]) -> None:
+        """Init method of StubServer"""
+        self.routes = dict(routes)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.last_headers: Dict[str, str] = {}
+        self._server = _Server(("127.0.0.1", 0), StubHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def record(self, handler: StubHandler) -> None:
+        """Record a served request"""
+        with self.lock:
+            self.requests += 1
+            self.last_headers = dict(handler.headers)
+
+    def url(self, path: str = "/") -> str:
+        """Absolute URL of `path` on this server"""
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}{}".format(host, port, path)
+
+    def __enter__(self) -> "StubServer":
+        """Start serving"""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stop serving"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Learning async unittests against a local stub server
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized, parameterized_class
+from async_client import AsyncGithubOrgClient, resolve_orgs_async
+from async_utils import (
+    close_async_session,
+    gather_bounded,
+    get_async_session,
+    get_json_async,
+)
+from fixtures import TEST_PAYLOAD
+from metrics import instrumentation
+from stub_server import StubServer, paged_route
+from test_client import batch_server
+
+
+class TestAsyncUtils(unittest.IsolatedAsyncioTestCase):
+    """
+    Testing async_utils
+    """
+    async def asyncTearDown(self) -> None:
+        """Close the shared session of the test loop"""
+        await close_async_session()
+
+    async def test_get_json_async(self) -> None:
+        """
+        Testing expected result and connection reuse
+        """
+        with StubServer({"/orgs/google": {"login": "google"}}) as server:
+            for _ in range(3):
+                self.assertEqual(
+                    await get_json_async(server.url("/orgs/google")),
+                    {"login": "google"})
+        self.assertEqual(server.connections, 1)
+
+    async def test_coalesced(self) -> None:
+        """
+        Testing that concurrent fetches share one request, even when
+        one of the awaiters is cancelled
+        """
+        with StubServer({"/orgs/google": {"login": "google"}}) as server:
+            url = server.url("/orgs/google")
+            cancelled = asyncio.ensure_future(get_json_async(url))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            results = await asyncio.gather(
+                *(get_json_async(url) for _ in range(8)))
+        self.assertEqual(server.requests, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    async def test_instrumentation(self) -> None:
+        """
+        Testing latency, bytes and decode time of async fetches
+        """
+        instrumentation.reset()
+        instrumentation.enable()
+        self.addCleanup(instrumentation.reset)
+        self.addCleanup(instrumentation.disable)
+        with StubServer({"/orgs/google": {"login": "google"}}) as server:
+            await get_json_async(server.url("/orgs/google"))
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot["counters"], {"bytes_received": 19})
+        self.assertEqual(
+            snapshot["timings"]["request_latency_ns"]["count"], 1)
+        self.assertEqual(snapshot["timings"]["json_decode_ns"]["count"], 1)
+
+    async def test_shared_session(self) -> None:
+        """
+        Testing that the loop's session is reused until closed
+        """
+        session = get_async_session()
+        self.assertIs(get_async_session(), session)
+        await close_async_session()
+        self.assertTrue(session.closed)
+        self.assertIsNot(get_async_session(), session)
+
+    @parameterized.expand([(1,), (3,), (10,)])
+    async def test_gather_bounded(self, limit: int) -> None:
+        """
+        Testing result order and the concurrency bound
+        """
+        running = peak = 0
+
+        async def job(i: int) -> int:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001 * (i % 3))
+            running -= 1
+            return i
+
+        self.assertEqual(await gather_bounded(map(job, range(8)), limit),
+                         list(range(8)))
+        self.assertEqual(peak, min(limit, 8))
+
+
+@parameterized_class(
+    ("org_payload", "repos_payload", "expected_repos", "apache2_repos"),
+    TEST_PAYLOAD
+)
+class TestAsyncGithubOrgClient(unittest.IsolatedAsyncioTestCase):
+    """ Integration tests of AsyncGithubOrgClient against a stub server """
+
+    def setUp(self) -> None:
+        """Serve the fixtures on a local stub server"""
+        AsyncGithubOrgClient.shared_cache.clear()
+        self.server = StubServer({}).__enter__()
+        self.server.routes["/orgs/google"] = {
+            "repos_url": self.server.url("/orgs/google/repos")}
+        self.server.routes["/orgs/google/repos"] = paged_route(
+            self.repos_payload)
+        patcher = patch.object(AsyncGithubOrgClient, "ORG_URL",
+                               self.server.url("/orgs/{org}"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.__exit__)
+
+    async def asyncTearDown(self) -> None:
+        """Close the shared session of the test loop"""
+        await close_async_session()
+
+    @parameterized.expand([(1,), (2,), (100,)])
+    async def test_public_repos(self, per_page: int) -> None:
+        """ Integration test: public repos over one or many pages """
+        client = AsyncGithubOrgClient("google", per_page=per_page,
+                                      max_concurrency=2)
+        self.assertEqual(await client.public_repos(), self.expected_repos)
+        self.assertEqual(await client.public_repos("apache-2.0"),
+                         self.apache2_repos)
+        self.assertEqual(await client.public_repos("XLICENSE"), [])
+        pages = (len(self.repos_payload) + per_page - 1) // per_page
+        self.assertEqual(self.server.requests, 1 + pages)
+
+    @parameterized.expand([(False,), (True,)])
+    async def test_iter_public_repos(self, stream: bool) -> None:
+        """ Integration test: async generator of public repo names """
+        client = AsyncGithubOrgClient("google", per_page=2, stream=stream)
+        self.assertEqual([name async for name in client.iter_public_repos()],
+                         self.expected_repos)
+        self.assertEqual(
+            [name async for name in client.iter_public_repos("apache-2.0")],
+            self.apache2_repos)
+        self.assertEqual(
+            [name async for name in client.iter_public_repos(
+                "apache-2.0", name=lambda name: name.startswith("k"))],
+            ["kratu"])
+
+    async def test_iter_public_repos_lazy(self) -> None:
+        """ Integration test: stopping early fetches no further pages,
+        and a complete walk fills the shared cache """
+        client = AsyncGithubOrgClient("google", per_page=2)
+        async for name in client.iter_public_repos():
+            self.assertEqual(name, self.expected_repos[0])
+            break
+        self.assertEqual(self.server.requests, 2)
+        names = [name async for name in client.iter_public_repos()]
+        self.assertEqual(names, self.expected_repos)
+        requests = self.server.requests
+        self.assertEqual(await client.public_repos(), self.expected_repos)
+        self.assertEqual(self.server.requests, requests)
+
+    async def test_iter_public_repos_uncached(self) -> None:
+        """ Integration test: without a shared cache, each walk follows
+        the pages again and nothing is stored """
+        client = AsyncGithubOrgClient("google", per_page=3)
+        with patch.object(AsyncGithubOrgClient, "shared_cache", None):
+            for _ in range(2):
+                self.assertEqual(
+                    [name async for name in client.iter_public_repos()],
+                    self.expected_repos)
+        pages = (len(self.repos_payload) + 2) // 3
+        self.assertEqual(self.server.requests, 1 + 2 * pages)
+        self.assertEqual(len(AsyncGithubOrgClient.shared_cache), 0)
+
+    async def test_shared_cache(self) -> None:
+        """ Integration test: instances share fetched payloads """
+        for _ in range(3):
+            self.assertEqual(
+                await AsyncGithubOrgClient("google").public_repos(),
+                self.expected_repos)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(AsyncGithubOrgClient.shared_cache.stats()["hits"],
+                         4)
+
+    async def test_concurrent_clients(self) -> None:
+        """ Integration test: concurrent instances coalescing the first
+        page each get every repo once """
+        clients = [AsyncGithubOrgClient("google", per_page=3)
+                   for _ in range(2)]
+        results = await asyncio.gather(
+            *(client.public_repos() for client in clients))
+        self.assertEqual(results, [self.expected_repos] * 2)
+        self.assertEqual(
+            await AsyncGithubOrgClient("google", per_page=3).public_repos(),
+            self.expected_repos)
+
+    async def test_org(self) -> None:
+        """ Integration test: org payload is fetched once """
+        client = AsyncGithubOrgClient("google")
+        org = await client.org()
+        self.assertEqual(org["repos_url"],
+                         self.server.url("/orgs/google/repos"))
+        self.assertIs(await client.org(), org)
+        self.assertEqual(self.server.requests, 1)
+
+
+class TestResolveOrgsAsync(unittest.IsolatedAsyncioTestCase):
+    """ Testing the asyncio multi-org batch resolver """
+
+    async def asyncTearDown(self) -> None:
+        """Close the shared session of the test loop"""
+        await close_async_session()
+
+    async def test_resolve_orgs_async(self) -> None:
+        """ Testing results and per-org error isolation """
+        with batch_server() as server:
+            with patch.object(AsyncGithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                results = [result async for result in resolve_orgs_async(
+                    ["org{}".format(i) for i in range(5)], max_in_flight=2)]
+        self.assertEqual(len(results), 5)
+        by_name = {result.org_name: result for result in results}
+        self.assertEqual(by_name["org4"].repos,
+                         ["org4-repo{}".format(j) for j in range(4)])
+        self.assertIsNone(by_name["org4"].error)
+        self.assertIsInstance(by_name["org3"].error, KeyError)
@@ -3,18 +3,38 @@
 Learning Unittests and Integration Tests
 """
 
+import json
+import os
+import tempfile
 import unittest
+from itertools import islice
+import client
 from unittest.mock import patch, Mock, PropertyMock
-from client import GithubOrgClient
+from client import (
+    NO_LICENSE,
+    GithubOrgClient,
+    LicenseIndex,
+    OrgResult,
+    Repo,
+    make_repo_record,
+    resolve_orgs,
+)
 from parameterized import parameterized, parameterized_class
 from typing import Dict, Callable
+from caches import SQLiteResponseCache
 from fixtures import TEST_PAYLOAD
+from metrics import instrumentation
+from stub_server import StubServer, paged_route
 
 
 class TestGithubOrgClient(unittest.TestCase):
     """
     Testing GitHubOrgClient
     """
+    def setUp(self) -> None:
+        """Start each test with an empty shared cache"""
+        GithubOrgClient.shared_cache.clear()
+
     @parameterized.expand([
         ("google", {"login": "google", "id": 1342004,
                     "repos_url": "https://api.github.com/orgs/google/repos"}),
@@ -51,7 +71,7 @@ class TestGithubOrgClient(unittest.TestCase):
                              "https://api.github.com/orgs/google/repos")
 
     @patch(
-            "client.get_json",
+            "client.get_json_page",
     )
     def test_public_repos(self, mocked_get_json: Mock):
         """
@@ -72,7 +92,7 @@ class TestGithubOrgClient(unittest.TestCase):
                 "name": "ruby-openid-apps-discovery",
                 "license": None
             }
-        ]
+        ], None
         with patch("client.GithubOrgClient._public_repos_url",
                    new_callable=PropertyMock) as mocked_repos:
             mocked_repos.return_value =\
@@ -84,6 +104,148 @@ class TestGithubOrgClient(unittest.TestCase):
             mocked_get_json.assert_called_once()
             mocked_repos.assert_called_once()
 
+    @patch("client.get_json")
+    def test_shared_cache(self, mocked_get_json: Mock) -> None:
+        """
+        Testing that instances share the org payload
+        """
+        mocked_get_json.return_value = {"repos_url": "https://a.io/repos"}
+        for _ in range(3):
+            self.assertEqual(GithubOrgClient("google").org,
+                             mocked_get_json.return_value)
+        mocked_get_json.assert_called_once()
+        stats = GithubOrgClient.shared_cache.stats()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"]),
+                         (1, 2, 1))
+        with patch.object(GithubOrgClient, "shared_cache", None):
+            GithubOrgClient("google").org
+        self.assertEqual(mocked_get_json.call_count, 2)
+
+    def test_eviction_releases_payload(self) -> None:
+        """
+        Testing that LRU eviction drops the repos payload along with
+        its license index
+        """
+        payload = [{"name": "a", "license": {"key": "mit"}}]
+        with patch("client.get_json_page", return_value=(payload, None)), \
+                patch("client.GithubOrgClient._public_repos_url",
+                      new_callable=PropertyMock,
+                      return_value="https://a.io/repos"), \
+                patch.object(GithubOrgClient.repos_payload, "maxsize", 2), \
+                patch.object(GithubOrgClient._indexed_payload, "maxsize", 2):
+            clients = [GithubOrgClient("google") for _ in range(4)]
+            for org_client in clients:
+                self.assertEqual(org_client.public_repos("mit"), ["a"])
+            for org_client, kept in zip(clients, [False] * 2 + [True] * 2):
+                self.assertEqual(
+                    [hasattr(org_client, name) for name in (
+                        "_repos_payload", "__indexed_payload")],
+                    [kept, kept])
+
+    @parameterized.expand([
+        ("apache-2.0", ["dagger", "kratu", "traceur-compiler",
+                        "firmata.py"]),
+        ("XLICENSE", []),
+        (NO_LICENSE, ["google.github.io"]),
+        (["other", "bsl-1.0"], ["cpp-netlib", "ios-webkit-debug-proxy",
+                                "build-debian-cloud"]),
+        (("bsd-3-clause", NO_LICENSE, "bsd-3-clause"),
+         ["episodes.dart", "google.github.io"]),
+    ])
+    def test_license_index(self, license, expected) -> None:
+        """
+        Testing license filters answered by LicenseIndex
+        """
+        index = LicenseIndex(TEST_PAYLOAD[0][1])
+        self.assertEqual(index.names_with(license), expected)
+        self.assertIn(NO_LICENSE, index.licenses())
+
+    def test_license_index_reuse(self) -> None:
+        """
+        Testing that the index is built once per payload
+        """
+        payload = [{"name": "a", "license": {"key": "mit"}},
+                   {"name": "b"}]
+        with patch("client.GithubOrgClient.repos_payload",
+                   new_callable=PropertyMock) as mocked_payload, \
+                patch("client._license_key",
+                      wraps=client._license_key) as mocked_access:
+            mocked_payload.return_value = payload
+            org_client = GithubOrgClient("google")
+            self.assertEqual(org_client.public_repos("mit"), ["a"])
+            self.assertEqual(org_client.public_repos(NO_LICENSE), ["b"])
+            self.assertEqual(mocked_access.call_count, 2)
+            mocked_payload.return_value = payload[:1]
+            self.assertEqual(org_client.public_repos(NO_LICENSE), [])
+            self.assertEqual(mocked_access.call_count, 3)
+
+    def test_repo_record(self) -> None:
+        """
+        Testing compact repo records
+        """
+        payload = json.loads(json.dumps(TEST_PAYLOAD[0][1]))
+        records = [Repo.from_payload(repo) for repo in payload]
+        self.assertEqual(records[2].name, "dagger")
+        self.assertEqual(records[2].license_key, "apache-2.0")
+        self.assertEqual(records[2].owner_login, "google")
+        self.assertIsNone(records[4].license_key)
+        self.assertIs(records[2].license_key, records[5].license_key)
+        self.assertIs(records[0].owner_login, records[1].owner_login)
+        self.assertFalse(hasattr(records[0], "__dict__"))
+        loaded = [Repo.from_values(values)
+                  for values in json.loads(json.dumps(records))]
+        self.assertEqual(loaded, records)
+        self.assertIs(loaded[2].license_key, records[5].license_key)
+        with self.assertRaises(TypeError):
+            Repo.from_values(["dagger"])
+
+        Small = make_repo_record({"name": ("name",),
+                                  "license_key": ("license", "key")},
+                                 typename="Small")
+        self.assertEqual(Small.from_payload(payload[2]),
+                         ("dagger", "apache-2.0"))
+        with self.assertRaises(ValueError):
+            make_repo_record({"name": ("name",)})
+
+    @parameterized.expand([
+        ({}, None, ["a", "b", "c"]),
+        ({"fork": False}, None, ["a", "c"]),
+        ({"fork": False}, NO_LICENSE, ["c"]),
+        ({"forks": lambda forks: forks > 1}, None, ["b", "c"]),
+        ({"owner_login": "google", "language": "Go"}, "mit", ["b"]),
+    ])
+    def test_iter_public_repos_filters(self, filters, license,
+                                       expected) -> None:
+        """
+        Testing field filters on dicts and records
+        """
+        payload = [
+            {"name": "a", "fork": False, "forks": 0, "language": "C",
+             "license": {"key": "mit"}, "owner": {"login": "google"}},
+            {"name": "b", "fork": True, "forks": 2, "language": "Go",
+             "license": {"key": "mit"}, "owner": {"login": "google"}},
+            {"name": "c", "fork": False, "forks": 5, "language": "Go",
+             "license": None, "owner": {"login": "abc"}},
+        ]
+        with patch("client.get_json_page", return_value=(payload, None)), \
+                patch("client.GithubOrgClient._public_repos_url",
+                      new_callable=PropertyMock,
+                      return_value="https://a.io/repos"):
+            for record_type in (None, Repo):
+                GithubOrgClient.shared_cache.clear()
+                org_client = GithubOrgClient("google",
+                                             record_type=record_type)
+                self.assertEqual(list(org_client.iter_public_repos(
+                    license, **filters)), expected)
+
+    def test_iter_public_repos_unknown_field(self) -> None:
+        """
+        Testing that record clients reject fields they do not hold
+        """
+        org_client = GithubOrgClient("google", record_type=Repo)
+        with self.assertRaises(ValueError):
+            next(org_client.iter_public_repos(archived=False))
+
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
         ({"license": {"key": "other_license"}}, "my_license", False)
@@ -111,12 +273,17 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
                   [
                       cls.org_payload, cls.repos_payload,
                       cls.org_payload, cls.repos_payload
-                  ]
+                  ],
+                  'return_value.headers': {}
                   }
-        cls.get_patcher = patch('requests.get', **config)
+        cls.get_patcher = patch('requests.Session.get', **config)
 
         cls.mock = cls.get_patcher.start()
 
+    def setUp(self) -> None:
+        """Start each test with an empty shared cache"""
+        GithubOrgClient.shared_cache.clear()
+
     def test_public_repos(self) -> None:
         """ Integration test: public repos"""
         test_class = GithubOrgClient("google")
@@ -141,3 +308,188 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     def tearDownClass(cls) -> None:
         """A class method called after tests in an individual class have run"""
         cls.get_patcher.stop()
+
+
+@parameterized_class(
+    ("org_payload", "repos_payload", "expected_repos", "apache2_repos"),
+    TEST_PAYLOAD
+)
+class TestStubServerGithubOrgClient(unittest.TestCase):
+    """ Integration tests against a local stub of the GitHub API """
+
+    def test_paginated_repos(self) -> None:
+        """ Integration test: repos spread over several pages """
+        with StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                test_class = GithubOrgClient("google", per_page=2,
+                                             prefetch=True)
+                self.assertEqual(test_class.public_repos(),
+                                 self.expected_repos)
+                self.assertEqual(test_class.public_repos("apache-2.0"),
+                                 self.apache2_repos)
+            self.assertEqual(server.requests,
+                             1 + (len(self.repos_payload) + 1) // 2)
+
+    @parameterized.expand([(None,), (Repo,)])
+    def test_stream(self, record_type) -> None:
+        """ Integration test: repos parsed from the response streams """
+        with StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                test_class = GithubOrgClient("google", per_page=4,
+                                             stream=True,
+                                             record_type=record_type)
+                self.assertEqual(test_class.public_repos(),
+                                 self.expected_repos)
+                self.assertEqual(test_class.public_repos("apache-2.0"),
+                                 self.apache2_repos)
+                self.assertEqual(
+                    test_class.public_repos(["bsl-1.0", NO_LICENSE]),
+                    ["cpp-netlib", "google.github.io"])
+
+    def test_iter_public_repos(self) -> None:
+        """ Integration test: names are yielded page by page """
+        with StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                for stream in (False, True):
+                    GithubOrgClient.shared_cache.clear()
+                    server.requests = 0
+                    test_class = GithubOrgClient("google", per_page=2,
+                                                 stream=stream)
+                    names = test_class.iter_public_repos()
+                    self.assertEqual(next(names), self.expected_repos[0])
+                    self.assertEqual(server.requests, 2)
+                    self.assertEqual(list(islice(names, 2)),
+                                     self.expected_repos[1:3])
+                    self.assertEqual(server.requests, 3)
+                    self.assertEqual(
+                        list(test_class.iter_public_repos("apache-2.0")),
+                        self.apache2_repos)
+
+    def test_repo_records(self) -> None:
+        """ Integration test: repos held as compact records """
+        GithubOrgClient.shared_cache.clear()
+        with StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                raw = GithubOrgClient("google")
+                test_class = GithubOrgClient("google", record_type=Repo)
+                self.assertEqual(test_class.public_repos(),
+                                 self.expected_repos)
+                self.assertEqual(test_class.public_repos("apache-2.0"),
+                                 self.apache2_repos)
+                self.assertIsInstance(test_class.repos_payload[0], Repo)
+                self.assertIsInstance(raw.repos_payload[0], dict)
+
+    def test_repo_records_persistent_cache(self) -> None:
+        """ Integration test: records survive a persistent cache """
+        with tempfile.TemporaryDirectory() as tmp, StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            path = os.path.join(tmp, "cache.sqlite")
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                for _ in range(2):
+                    cache = SQLiteResponseCache(path)
+                    with patch.object(GithubOrgClient, "shared_cache",
+                                      cache):
+                        test_class = GithubOrgClient("google",
+                                                     record_type=Repo)
+                        self.assertEqual(
+                            test_class.public_repos("apache-2.0"),
+                            self.apache2_repos)
+                        repos = test_class.repos_payload
+                        self.assertIsInstance(repos[0], Repo)
+                        google = [repo for repo in repos
+                                  if repo.owner_login == "google"]
+                        apache2 = [repo for repo in repos
+                                   if repo.license_key == "apache-2.0"]
+                        self.assertIs(google[0].owner_login,
+                                      google[1].owner_login)
+                        self.assertIs(apache2[0].license_key,
+                                      apache2[1].license_key)
+                    cache.close()
+            self.assertEqual(server.requests, 2)
+
+    def test_instrumentation(self) -> None:
+        """ Integration test: the hot path reports into metrics """
+        GithubOrgClient.shared_cache.clear()
+        instrumentation.reset()
+        instrumentation.enable()
+        self.addCleanup(instrumentation.reset)
+        self.addCleanup(instrumentation.disable)
+        with StubServer({}) as server:
+            server.routes["/orgs/google"] = {
+                "repos_url": server.url("/orgs/google/repos")}
+            server.routes["/orgs/google/repos"] = paged_route(
+                self.repos_payload)
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                test_class = GithubOrgClient("google", per_page=4)
+                for _ in range(2):
+                    self.assertEqual(test_class.public_repos("apache-2.0"),
+                                     self.apache2_repos)
+        snapshot = instrumentation.snapshot()
+        timings, counters = snapshot["timings"], snapshot["counters"]
+        self.assertEqual(timings["request_latency_ns"]["count"],
+                         server.requests)
+        self.assertEqual(timings["json_decode_ns"]["count"],
+                         server.requests)
+        self.assertEqual(timings["public_repos_filter_ns"]["count"], 2)
+        self.assertGreater(counters["bytes_received"],
+                           len(json.dumps(self.repos_payload)))
+        payload = 'method="GithubOrgClient.repos_payload"'
+        self.assertEqual(counters["memoize_misses{%s}" % payload], 1)
+        self.assertGreaterEqual(counters["memoize_hits{%s}" % payload], 1)
+
+
+def batch_server() -> StubServer:
+    """Stub server with orgs org0..org4, org3 being unknown"""
+    server = StubServer({})
+    for i in (0, 1, 2, 4):
+        org = "/orgs/org{}".format(i)
+        server.routes[org] = {"repos_url": server.url(org + "/repos")}
+        server.routes[org + "/repos"] = [
+            {"name": "org{}-repo{}".format(i, j), "license": None}
+            for j in range(i)
+        ]
+    return server
+
+
+class TestResolveOrgs(unittest.TestCase):
+    """ Testing the multi-org batch resolver """
+
+    def test_resolve_orgs(self) -> None:
+        """ Testing results and per-org error isolation """
+        with batch_server() as server:
+            with patch.object(GithubOrgClient, "ORG_URL",
+                              server.url("/orgs/{org}")):
+                results = list(resolve_orgs(
+                    ("org{}".format(i) for i in range(5)), max_in_flight=2))
+        self.assertEqual(len(results), 5)
+        by_name = {result.org_name: result for result in results}
+        self.assertEqual(by_name["org2"],
+                         OrgResult("org2", ["org2-repo0", "org2-repo1"]))
+        self.assertEqual(by_name["org0"], OrgResult("org0", []))
+        self.assertIsNone(by_name["org3"].repos)
+        self.assertIsInstance(by_name["org3"].error, KeyError)
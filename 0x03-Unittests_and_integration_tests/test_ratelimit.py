@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Learning unittests for the rate limit scheduler
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import utils
+from parameterized import parameterized
+from async_utils import close_async_session, get_json_async
+from ratelimit import PRIORITY_ORG, PRIORITY_PAGE, RateLimitScheduler
+from ratelimit import is_rate_limited
+from stub_server import StubServer
+
+
+def limited_route(limits):
+    """Stub route answering with the (status, remaining) of `limits` in
+    turn, with GitHub's rate limit headers"""
+    answers = iter(limits)
+
+    def route(handler):
+        """Answer the next scripted status"""
+        status, remaining = next(answers)
+        headers = {"X-RateLimit-Remaining": str(remaining),
+                   "X-RateLimit-Reset": str(time.time() + 0.2)}
+        if status == 429:
+            headers["Retry-After"] = "0.1"
+        return status, headers, b'{"login": "google"}'
+
+    return route
+
+
+class TestRateLimitScheduler(unittest.TestCase):
+    """
+    Testing ratelimit.RateLimitScheduler
+    """
+    @parameterized.expand([
+        (429, {}, True),
+        (403, {"X-RateLimit-Remaining": "0"}, True),
+        (403, {"Retry-After": "3"}, True),
+        (403, {"X-RateLimit-Remaining": "12"}, False),
+        (200, {"X-RateLimit-Remaining": "0"}, False),
+    ])
+    def test_is_rate_limited(self, status, headers, expected) -> None:
+        """
+        Testing rate limited answer detection
+        """
+        self.assertEqual(is_rate_limited(status, headers), expected)
+
+    def test_token_bucket(self) -> None:
+        """
+        Testing burst then refill pacing
+        """
+        scheduler = RateLimitScheduler(rate=50, burst=3, jitter=0)
+        start = time.monotonic()
+        for _ in range(5):
+            scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+        self.assertEqual(scheduler.stats()["acquired"], 5)
+
+    def test_priorities(self) -> None:
+        """
+        Testing that org lookups overtake queued repo pages
+        """
+        scheduler = RateLimitScheduler(rate=20, burst=1, jitter=0)
+        scheduler.acquire()
+        order = []
+
+        def request(name, priority):
+            scheduler.acquire(priority)
+            order.append(name)
+
+        pages = [threading.Thread(target=request,
+                                  args=("page", PRIORITY_PAGE))
+                 for _ in range(2)]
+        for thread in pages:
+            thread.start()
+        time.sleep(0.01)
+        org = threading.Thread(target=request, args=("org", PRIORITY_ORG))
+        org.start()
+        for thread in pages + [org]:
+            thread.join()
+        self.assertEqual(order, ["org", "page", "page"])
+
+    def test_update(self) -> None:
+        """
+        Testing pauses and pacing from response headers
+        """
+        scheduler = RateLimitScheduler(burst=5, jitter=0)
+        scheduler.update({"X-RateLimit-Remaining": "0",
+                          "X-RateLimit-Reset": str(time.time() + 0.1)})
+        start = time.monotonic()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        scheduler.update({"X-RateLimit-Remaining": "100",
+                          "X-RateLimit-Reset": str(time.time() + 50)})
+        self.assertAlmostEqual(scheduler.rate, 2.0, places=1)
+        scheduler.update({"X-RateLimit-Remaining": "oops"})
+        self.assertAlmostEqual(scheduler.rate, 2.0, places=1)
+
+
+class TestRateLimitedGetJson(unittest.TestCase):
+    """
+    Testing get_json through the scheduler against a stub server
+    """
+    def setUp(self) -> None:
+        """Install a scheduler"""
+        self.scheduler = RateLimitScheduler(jitter=0.1, backoff_base=0.05)
+        self.previous = utils.set_rate_limiter(self.scheduler)
+
+    def tearDown(self) -> None:
+        """Restore the previous scheduler"""
+        utils.set_rate_limiter(self.previous)
+
+    def test_backoff(self) -> None:
+        """
+        Testing that rate limited answers are retried after a pause
+        """
+        route = limited_route([(429, 0), (403, 0), (200, 4999)])
+        with StubServer({"/orgs/google": route}) as server:
+            start = time.monotonic()
+            self.assertEqual(utils.get_json(server.url("/orgs/google")),
+                             {"login": "google"})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(self.scheduler.stats()["throttled"], 2)
+
+    def test_gives_up(self) -> None:
+        """
+        Testing that retries are bounded
+        """
+        route = limited_route([(429, 0)] * 2)
+        with StubServer({"/orgs/google": route}) as server:
+            with patch("utils.RATE_LIMIT_RETRIES", 1):
+                utils.get_json(server.url("/orgs/google"))
+        self.assertEqual(server.requests, 2)
+
+    def test_async(self) -> None:
+        """
+        Testing coroutines sharing the scheduler with threads
+        """
+        route = limited_route([(429, 0)] + [(200, 4999)] * 4)
+
+        async def main(url):
+            try:
+                return await asyncio.gather(
+                    *(get_json_async(url) for _ in range(4)))
+            finally:
+                await close_async_session()
+
+        with StubServer({"/orgs/google": route}) as server:
+            results = asyncio.run(main(server.url("/orgs/google")))
+        self.assertEqual(results, [{"login": "google"}] * 4)
+        self.assertEqual(self.scheduler.stats()["throttled"], 1)
+        self.assertEqual(self.scheduler.stats()["queued"], 0)
@@ -3,12 +3,32 @@
 Learning Unittests
 """
 
+import asyncio
+import importlib.util
+import json
+import math
+import socket
+import tempfile
+import threading
+import time
 import unittest
 import utils
+from caches import (
+    DiskValidatorCache,
+    MemoryResponseCache,
+    MemoryValidatorCache,
+    SQLiteResponseCache,
+)
+from array import array
+from metrics import Instrumentation, LatencyHistogram, RequestMetrics
+from metrics import instrumentation
 from parameterized import parameterized
-from typing import Mapping, Tuple, Union, Dict
+from types import MappingProxyType
+from typing import Mapping, Tuple, Union, Dict, List, Optional
 from unittest.mock import Mock, patch
-from utils import memoize
+from utils import async_memoize, memoize
+from retry import HEDGE_MIN_SAMPLES, HEDGE_REFRESH_SAMPLES, RetryPolicy
+from stub_server import StubServer, paged_route
 
 
 class TestAccessNestedMap(unittest.TestCase):
@@ -49,6 +69,123 @@ class TestAccessNestedMap(unittest.TestCase):
             utils.access_nested_map(nested_map, path)
 
 
+class TestCompilePath(unittest.TestCase):
+    """
+    Testing utils.compile_path getters
+    """
+    @parameterized.expand([
+        ({"a": 1}, ("a",), 1),
+        ({"a": {"b": 2}}, ("a",), {"b": 2}),
+        ({"a": {"b": 2}}, ("a", "b"), 2),
+        (MappingProxyType({"a": {"b": 2}}), ("a", "b"), 2),
+        ({"a": MappingProxyType({"b": 2})}, ("a", "b"), 2),
+    ])
+    def test_compile_path(self, nested_map: Mapping, path: Tuple[str],
+                          expected_result: Union[Dict, int]) -> None:
+        """
+        Testing results match access_nested_map
+        """
+        getter = utils.compile_path(path)
+        self.assertEqual(getter(nested_map), expected_result)
+        self.assertEqual(getter(nested_map),
+                         utils.access_nested_map(nested_map, path))
+
+    @parameterized.expand([
+        ({}, ("a",), "a"),
+        ({"a": 1}, ("a", "b"), "b"),
+        ({"a": None}, ("a", "b"), "b"),
+        (MappingProxyType({}), ("a",), "a"),
+    ])
+    def test_compile_path_missing(self, nested_map: Mapping,
+                                  path: Tuple[str], key: str) -> None:
+        """
+        Testing KeyError and default on missing keys
+        """
+        with self.assertRaises(KeyError) as error:
+            utils.compile_path(path)(nested_map)
+        self.assertEqual(error.exception.args, (key,))
+        self.assertIsNone(utils.compile_path(path, None)(nested_map))
+        self.assertEqual(utils.compile_path(path, 0)(nested_map), 0)
+
+
+class TestExtractColumns(unittest.TestCase):
+    """
+    Testing utils.extract_columns
+    """
+    repos = [
+        {"name": "a", "forks": 3, "license": {"key": "mit"},
+         "owner": {"login": "google"}},
+        {"name": "b", "forks": 1.5, "license": None,
+         "owner": {"login": "google"}},
+        {"name": "c", "owner": {}},
+    ]
+
+    def test_extract_columns(self) -> None:
+        """
+        Testing named and dotted columns with sentinels
+        """
+        columns = utils.extract_columns(
+            self.repos, [("name",), ("license", "key"), ("owner", "login")],
+            default="-")
+        self.assertEqual(columns, {"name": ["a", "b", "c"],
+                                   "license.key": ["mit", "-", "-"],
+                                   "owner.login": ["google", "google", "-"]})
+
+    def test_numeric_columns(self) -> None:
+        """
+        Testing array columns and their sentinel
+        """
+        columns = utils.extract_columns(
+            self.repos, {"forks": ("forks",), "name": ("name",)},
+            numeric=["forks"], numeric_default=-1)
+        self.assertEqual(columns["forks"], array("d", [3, 1.5, -1]))
+        self.assertEqual(columns["name"], ["a", "b", "c"])
+        nan = utils.extract_columns(self.repos, {"forks": ("forks",)},
+                                    numeric=["forks"])["forks"][2]
+        self.assertTrue(math.isnan(nan))
+
+    def test_string_paths(self) -> None:
+        """
+        Testing that a string path is a single key, not its characters
+        """
+        columns = utils.extract_columns(
+            self.repos, ["name", ("owner", "login")], default="-")
+        self.assertEqual(columns, {"name": ["a", "b", "c"],
+                                   "owner.login": ["google", "google", "-"]})
+        forks = utils.extract_columns(self.repos, {"forks": "forks"},
+                                      numeric=["forks"], numeric_default=0)
+        self.assertEqual(forks["forks"], array("d", [3, 1.5, 0]))
+
+    def test_non_numeric_values(self) -> None:
+        """
+        Testing that null and non-numeric values get the sentinel
+        """
+        columns = utils.extract_columns(
+            [{"forks": None}, {"forks": "12"}, {"forks": True},
+             {"forks": 4}], [("forks",)], numeric=["forks"],
+            numeric_default=-1)
+        self.assertEqual(columns["forks"], array("d", [-1, -1, 1, 4]))
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"),
+                         "numpy is not installed")
+    def test_numpy_columns(self) -> None:
+        """
+        Testing NumPy numeric columns
+        """
+        columns = utils.extract_columns(
+            self.repos, {"forks": ("forks",)}, numeric=["forks"],
+            numeric_default=0, as_numpy=True)
+        self.assertEqual(columns["forks"].sum(), 4.5)
+
+    def test_unknown_numeric(self) -> None:
+        """
+        Testing that numeric columns must be extracted
+        """
+        with self.assertRaises(KeyError):
+            utils.extract_columns(self.repos, [("name",)],
+                                  numeric=["forks"])
+
+
 class TestGetJson(unittest.TestCase):
     """
     Testing utils.get_json method
@@ -66,10 +203,435 @@ class TestGetJson(unittest.TestCase):
         Testing expected result
         """
         attrs = {'json.return_value': test_payload}
-        with patch('requests.get', return_value=Mock(**attrs)) as mock_get:
+        with patch('utils.get_session') as mock_session:
+            mock_get = mock_session.return_value.get
+            mock_get.return_value = Mock(**attrs)
             self.assertEqual(utils.get_json(test_url), test_payload)
             mock_get.assert_called_once_with(test_url)
 
+    def test_get_json_explicit_session(self) -> None:
+        """
+        Testing that an injected session is used instead of the pool
+        """
+        session = Mock(**{'get.return_value.json.return_value': {}})
+        with patch('utils.get_session') as mock_session:
+            self.assertEqual(utils.get_json("http://a.io", session), {})
+            mock_session.assert_not_called()
+        session.get.assert_called_once_with("http://a.io")
+
+
+class TestSession(unittest.TestCase):
+    """
+    Testing the shared pooled session
+    """
+    def tearDown(self) -> None:
+        """Drop any session installed by a test"""
+        utils.set_session(None)
+
+    def test_make_session(self) -> None:
+        """
+        Testing the adapter pool configuration
+        """
+        session = utils.make_session(pool_connections=3, pool_maxsize=7)
+        adapter = session.get_adapter("https://api.github.com")
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(session.headers["Connection"], "keep-alive")
+
+    def test_set_session(self) -> None:
+        """
+        Testing session injection and replacement
+        """
+        default = utils.get_session()
+        self.assertIs(utils.get_session(), default)
+        custom = utils.make_session()
+        self.assertIs(utils.set_session(custom), default)
+        self.assertIs(utils.get_session(), custom)
+        self.assertIs(utils.set_session(None), custom)
+        self.assertIsNot(utils.get_session(), custom)
+
+    def test_keep_alive(self) -> None:
+        """
+        Testing that back to back calls reuse one connection
+        """
+        with StubServer({"/orgs/google": {"login": "google"}}) as server:
+            for _ in range(5):
+                self.assertEqual(
+                    utils.get_json(server.url("/orgs/google")),
+                    {"login": "google"})
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(server.connections, 1)
+
+
+def scripted_route(replies):
+    """Stub route answering with the (status, delay) of `replies` in
+    turn, sleeping `delay` seconds before each answer"""
+    answers = iter(replies)
+    lock = threading.Lock()
+
+    def route(handler):
+        """Answer the next scripted reply"""
+        with lock:
+            status, delay = next(answers)
+        time.sleep(delay)
+        return status, {}, json.dumps({"status": status}).encode()
+
+    return route
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """
+    Testing retries, timeouts and hedging in utils.get_json
+    """
+    def setUp(self) -> None:
+        """Use a fresh session and metrics"""
+        self.session = utils.make_session()
+        self.metrics = RequestMetrics()
+
+    def tearDown(self) -> None:
+        """Uninstall the policy"""
+        utils.set_retry_policy(None)
+        self.session.close()
+
+    def install(self, **kwargs) -> RetryPolicy:
+        """Install a fast policy recording into self.metrics"""
+        kwargs.setdefault("backoff_base", 0.001)
+        policy = RetryPolicy(metrics=self.metrics, **kwargs)
+        utils.set_retry_policy(policy)
+        return policy
+
+    def test_set_retry_policy(self) -> None:
+        """
+        Testing policy installation and replacement
+        """
+        policy = RetryPolicy()
+        self.assertIsNone(utils.set_retry_policy(policy))
+        self.assertIs(utils.get_retry_policy(), policy)
+        self.assertIs(utils.set_retry_policy(None), policy)
+
+    @parameterized.expand([
+        (0, 0.5),
+        (1, 1.0),
+        (3, 4.0),
+        (10, 30.0),
+    ])
+    def test_delay(self, attempt: int, expected: float) -> None:
+        """
+        Testing capped exponential backoff
+        """
+        policy = RetryPolicy(jitter=0)
+        self.assertEqual(policy.delay(attempt), expected)
+        jittered = RetryPolicy(jitter=0.5).delay(attempt)
+        self.assertTrue(expected / 2 <= jittered <= expected)
+
+    def test_hedge_delay(self) -> None:
+        """
+        Testing that hedge_quantile takes over once latencies are known
+        """
+        policy = RetryPolicy(hedge_after=1.0, hedge_quantile=0.95,
+                             metrics=self.metrics)
+        self.assertEqual(policy.hedge_delay(), 1.0)
+        for latency in range(1, 101):
+            self.metrics.latency.observe(latency / 1000)
+        self.assertEqual(policy.hedge_delay(), 0.096)
+        self.assertIsNone(RetryPolicy().hedge_delay())
+
+    def test_hedge_delay_refresh(self) -> None:
+        """
+        Testing that the hedge quantile is only recomputed every
+        HEDGE_REFRESH_SAMPLES latencies
+        """
+        policy = RetryPolicy(hedge_quantile=0.5, metrics=self.metrics)
+        latency = self.metrics.latency
+        for _ in range(HEDGE_MIN_SAMPLES):
+            latency.observe(0.1)
+        with patch.object(latency, "quantile",
+                          wraps=latency.quantile) as quantile:
+            for _ in range(10):
+                self.assertEqual(policy.hedge_delay(), 0.1)
+            for _ in range(HEDGE_REFRESH_SAMPLES - 1):
+                latency.observe(1.0)
+            self.assertEqual(policy.hedge_delay(), 0.1)
+            latency.observe(1.0)
+            self.assertEqual(policy.hedge_delay(), 1.0)
+        self.assertEqual(quantile.call_count, 2)
+
+    def test_retry_server_errors(self) -> None:
+        """
+        Testing that 5xx answers are retried until one succeeds
+        """
+        self.install()
+        route = scripted_route([(503, 0), (502, 0), (200, 0)])
+        with StubServer({"/a": route}) as server:
+            self.assertEqual(utils.get_json(server.url("/a"), self.session),
+                             {"status": 200})
+        self.assertEqual(server.requests, 3)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["requests"], 3)
+        self.assertEqual(snapshot["retries"], 2)
+        self.assertEqual(snapshot["latency"]["count"], 3)
+
+    @parameterized.expand([
+        (2, [(500, 0)] * 3, 3),
+        (2, [(404, 0)], 1),
+        (0, [(503, 0)], 1),
+    ])
+    def test_retry_bound(self, retries: int, replies, sent: int) -> None:
+        """
+        Testing that the last answer is returned once retries run out,
+        and that other errors are not retried
+        """
+        self.install(retries=retries)
+        with StubServer({"/a": scripted_route(replies)}) as server:
+            self.assertEqual(utils.get_json(server.url("/a"), self.session),
+                             {"status": replies[-1][0]})
+        self.assertEqual(server.requests, sent)
+
+    def test_retry_connection_errors(self) -> None:
+        """
+        Testing that connection errors are retried, then raised
+        """
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.install(retries=2)
+        with self.assertRaises(utils.requests.ConnectionError):
+            utils.get_json("http://127.0.0.1:{}/a".format(port),
+                           self.session)
+        self.assertEqual(self.metrics.counters["failures"], 3)
+        self.assertEqual(self.metrics.counters["retries"], 2)
+
+    def test_retry_timeouts(self) -> None:
+        """
+        Testing that the timeout applies and timed out requests retry
+        """
+        self.install(timeout=0.1)
+        route = scripted_route([(200, 0.5), (200, 0)])
+        with StubServer({"/a": route}) as server:
+            self.assertEqual(utils.get_json(server.url("/a"), self.session),
+                             {"status": 200})
+        self.assertEqual(self.metrics.counters["failures"], 1)
+        self.assertEqual(self.metrics.counters["retries"], 1)
+
+    def test_hedged_request(self) -> None:
+        """
+        Testing that a slow request is hedged and the hedge wins
+        """
+        self.install(hedge_after=0.05)
+        route = scripted_route([(200, 0.5), (200, 0)])
+        with StubServer({"/a": route}) as server:
+            start = time.monotonic()
+            self.assertEqual(utils.get_json(server.url("/a"), self.session),
+                             {"status": 200})
+            self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(server.requests, 2)
+        self.assertEqual(self.metrics.counters["hedges"], 1)
+        self.assertEqual(self.metrics.counters["hedge_wins"], 1)
+
+    def test_fast_request_not_hedged(self) -> None:
+        """
+        Testing that requests beating the hedge delay are sent once
+        """
+        self.install(hedge_after=1.0)
+        with StubServer({"/a": {"a": 1}}) as server:
+            for _ in range(3):
+                utils.get_json(server.url("/a"), self.session)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(self.metrics.counters["hedges"], 0)
+
+
+class TestCoalescing(unittest.TestCase):
+    """
+    Testing request coalescing in utils.get_json
+    """
+    def setUp(self) -> None:
+        """Count into fresh metrics"""
+        self.metrics = RequestMetrics()
+        utils.set_retry_policy(RetryPolicy(retries=0, metrics=self.metrics))
+
+    def tearDown(self) -> None:
+        """Restore the defaults"""
+        utils.set_retry_policy(None)
+        utils.set_coalescing(True)
+
+    def fetch_concurrently(self, url: str, count: int = 8) -> list:
+        """get_json `url` from `count` threads started together"""
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def fetch(i: int) -> None:
+            """Fetch once every thread is ready"""
+            barrier.wait()
+            try:
+                results[i] = utils.get_json(url)
+            except Exception as error:
+                results[i] = error
+
+        threads = [threading.Thread(target=fetch, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesced(self) -> None:
+        """
+        Testing that concurrent fetches share one request and body
+        """
+        route = scripted_route([(200, 0.2)])
+        with StubServer({"/a": route}) as server:
+            results = self.fetch_concurrently(server.url("/a"))
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(results[0], {"status": 200})
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.metrics.counters["coalesced"], 7)
+
+    def test_sequential_not_coalesced(self) -> None:
+        """
+        Testing that a finished fetch is not reused
+        """
+        with StubServer({"/a": {"a": 1}}) as server:
+            utils.get_json(server.url("/a"))
+            utils.get_json(server.url("/a"))
+        self.assertEqual(server.requests, 2)
+        self.assertEqual(self.metrics.counters["coalesced"], 0)
+
+    def test_failure_shared(self) -> None:
+        """
+        Testing that a failed fetch is raised in every waiter
+        """
+        def route(handler):
+            """Answer slowly with an invalid body"""
+            time.sleep(0.2)
+            return 200, {}, b"not json"
+
+        with StubServer({"/a": route}) as server:
+            results = self.fetch_concurrently(server.url("/a"), 4)
+        self.assertEqual(server.requests, 1)
+        self.assertTrue(all(isinstance(result, ValueError)
+                            for result in results))
+
+    def test_disabled(self) -> None:
+        """
+        Testing that set_coalescing(False) sends every request
+        """
+        self.assertTrue(utils.set_coalescing(False))
+        self.assertFalse(utils.is_coalescing())
+        route = scripted_route([(200, 0.1)] * 4)
+        with StubServer({"/a": route}) as server:
+            self.fetch_concurrently(server.url("/a"), 4)
+        self.assertEqual(server.requests, 4)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Testing metrics.Instrumentation and its hooks in utils
+    """
+    def setUp(self) -> None:
+        """Start from an empty registry"""
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.addCleanup(instrumentation.disable)
+
+    def test_disabled(self) -> None:
+        """
+        Testing that nothing is recorded by default
+        """
+        with StubServer({"/a": {"a": 1}}) as server:
+            utils.get_json(server.url("/a"))
+        self.assertEqual(instrumentation.snapshot(),
+                         {"counters": {}, "timings": {}})
+
+    def test_get_json(self) -> None:
+        """
+        Testing request latency, bytes and decode time of get_json
+        """
+        instrumentation.enable()
+        with StubServer({"/a": {"a": 1}}) as server:
+            utils.get_json(server.url("/a"))
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot["counters"], {"bytes_received": 8})
+        for name in ("request_latency_ns", "json_decode_ns"):
+            self.assertEqual(snapshot["timings"][name]["count"], 1)
+            self.assertGreater(snapshot["timings"][name]["sum"], 0)
+
+    def test_stream_bytes(self) -> None:
+        """
+        Testing that streamed bytes are counted
+        """
+        instrumentation.enable()
+        items = list(range(100))
+        with StubServer({"/r": paged_route(items, 50)}) as server:
+            self.assertEqual(list(utils.get_json_stream(server.url("/r"))),
+                             items)
+        self.assertEqual(instrumentation.counters[("bytes_received", ())],
+                         len(json.dumps(items[:50]))
+                         + len(json.dumps(items[50:])))
+
+    def test_memoize(self) -> None:
+        """
+        Testing memoize hit and miss counters
+        """
+        class Client:
+            @memoize
+            def org(self):
+                return 42
+
+        instrumentation.enable()
+        client = Client()
+        for _ in range(3):
+            client.org
+        counters = instrumentation.snapshot()["counters"]
+        label = 'method="{}"'.format(Client.org.__qualname__)
+        self.assertEqual(counters["memoize_misses{%s}" % label], 1)
+        self.assertEqual(counters["memoize_hits{%s}" % label], 2)
+
+    def test_hooks_and_prometheus(self) -> None:
+        """
+        Testing hooks and the Prometheus text export
+        """
+        registry = Instrumentation(namespace="test")
+        calls = []
+        registry.add_hook(lambda *args: calls.append(args))
+        registry.count("hits")
+        self.assertEqual(calls, [])
+        registry.enable()
+        registry.count("hits", 2, method='a"b')
+        registry.observe_ns("decode_ns", 5000)
+        self.assertEqual(calls, [("hits", 2, {"method": 'a"b'}),
+                                 ("decode_ns", 5000, {})])
+        text = registry.to_prometheus()
+        self.assertIn('# TYPE test_hits_total counter\n'
+                      'test_hits_total{method="a\\"b"} 2\n', text)
+        self.assertIn("# TYPE test_decode_ns histogram\n", text)
+        self.assertIn('test_decode_ns_bucket{le="1000"} 0\n', text)
+        self.assertIn('test_decode_ns_bucket{le="10000"} 1\n', text)
+        self.assertIn('test_decode_ns_bucket{le="+Inf"} 1\n', text)
+        self.assertIn("test_decode_ns_sum 5000\ntest_decode_ns_count 1\n",
+                      text)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """
+    Testing metrics.LatencyHistogram
+    """
+    def test_snapshot(self) -> None:
+        """
+        Testing cumulative buckets, sum and quantiles
+        """
+        histogram = LatencyHistogram(buckets=(0.1, 1.0, math.inf))
+        for seconds in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"],
+                         {0.1: 1, 1.0: 3, math.inf: 4})
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 3.05)
+        self.assertEqual(snapshot["p50"], 0.5)
+        self.assertEqual(snapshot["p99"], 2.0)
+        self.assertIsNone(LatencyHistogram().quantile(0.5))
+
 
 class TestMemoize(unittest.TestCase):
     """
@@ -95,3 +657,544 @@ class TestMemoize(unittest.TestCase):
             self.assertEqual(test_class.a_property(), 42)
             self.assertEqual(test_class.a_property(), 42)
             mock_class.assert_called_once()
+
+    def counting_class(self, **memoize_kwargs):
+        """A class whose memoized property counts its computations"""
+        class Counter:
+            calls = 0
+
+            @memoize(**memoize_kwargs)
+            def value(self):
+                type(self).calls += 1
+                return type(self).calls
+
+        return Counter
+
+    def test_memoize_ttl(self):
+        """
+        Testing that values are recomputed once expired
+        """
+        Counter = self.counting_class(ttl=10)
+        obj = Counter()
+        with patch("utils.time.monotonic", return_value=100.0) as clock:
+            self.assertEqual(obj.value, 1)
+            clock.return_value = 109.0
+            self.assertEqual(obj.value, 1)
+            clock.return_value = 110.5
+            self.assertEqual(obj.value, 2)
+            self.assertEqual(obj.value, 2)
+
+    def test_memoize_maxsize(self):
+        """
+        Testing LRU eviction across instances
+        """
+        Counter = self.counting_class(maxsize=2)
+        a, b, c = Counter(), Counter(), Counter()
+        self.assertEqual((a.value, b.value), (1, 2))
+        self.assertEqual(a.value, 1)
+        self.assertEqual(c.value, 3)
+        self.assertEqual(len(Counter.value), 2)
+        self.assertEqual((a.value, c.value), (1, 3))
+        self.assertEqual(b.value, 4)
+        del a, b, c
+        self.assertEqual(len(Counter.value), 0)
+
+    def test_memoize_hooks(self):
+        """
+        Testing invalidate, refresh and read-only access
+        """
+        Counter = self.counting_class()
+        obj = Counter()
+        self.assertEqual(obj.value, 1)
+        Counter.value.invalidate(obj)
+        self.assertEqual(obj.value, 2)
+        self.assertEqual(Counter.value.refresh(obj), 3)
+        self.assertEqual(obj.value, 3)
+        with self.assertRaises(AttributeError):
+            obj.value = 42
+
+    def test_memoize_single_flight(self):
+        """
+        Testing that concurrent first accesses compute once
+        """
+        release = threading.Event()
+        calls = []
+
+        class Slow:
+            @memoize
+            def value(self):
+                calls.append(1)
+                release.wait(5)
+                return 42
+
+        obj = Slow()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(obj.value))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_memoize_failure_not_cached(self):
+        """
+        Testing that failures reach every waiter and are retried
+        """
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        class Flaky:
+            @memoize
+            def value(self):
+                calls.append(1)
+                if len(calls) == 1:
+                    started.set()
+                    release.wait(5)
+                    raise ConnectionError("boom")
+                return 42
+
+        obj = Flaky()
+        errors = []
+
+        def access():
+            try:
+                obj.value
+            except ConnectionError as error:
+                errors.append(error)
+
+        leader = threading.Thread(target=access)
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=access)
+        waiter.start()
+        release.set()
+        leader.join()
+        waiter.join()
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+        self.assertEqual(obj.value, 42)
+        self.assertEqual(len(calls), 2)
+
+    def test_memoize_stale_while_revalidate(self):
+        """
+        Testing that expired values are served while refreshed in the
+        background, up to max_stale
+        """
+        Counter = self.counting_class(ttl=10, max_stale=5)
+        obj = Counter()
+        with patch("utils.time.monotonic", return_value=100.0) as clock:
+            self.assertEqual(obj.value, 1)
+            clock.return_value = 112.0
+            self.assertEqual(obj.value, 1)
+            while Counter.value._flights:
+                time.sleep(0.001)
+            self.assertEqual(obj.value, 2)
+            clock.return_value = 130.0
+            self.assertEqual(obj.value, 3)
+        with self.assertRaises(ValueError):
+            memoize(max_stale=5)(lambda self: 42)
+
+    def test_memoize_stale_refresh_failure(self):
+        """
+        Testing that a failed background refresh keeps the stale value
+        """
+        done = threading.Event()
+
+        class Flaky:
+            calls = 0
+
+            @memoize(ttl=10, max_stale=5)
+            def value(self):
+                type(self).calls += 1
+                if type(self).calls == 2:
+                    done.set()
+                    raise ConnectionError("boom")
+                return type(self).calls
+
+        obj = Flaky()
+        with patch("utils.time.monotonic", return_value=100.0) as clock:
+            self.assertEqual(obj.value, 1)
+            clock.return_value = 112.0
+            self.assertEqual(obj.value, 1)
+            self.assertTrue(done.wait(5))
+            while Flaky.value._flights:
+                time.sleep(0.001)
+            self.assertEqual(obj.value, 1)
+            while Flaky.value._flights:
+                time.sleep(0.001)
+            self.assertEqual(obj.value, 3)
+
+
+class TestAsyncMemoize(unittest.IsolatedAsyncioTestCase):
+    """
+    Testing the utils.async_memoize decorator
+    """
+    async def test_async_memoize(self):
+        """
+        Testing single-flight, failures and refresh on coroutines
+        """
+        calls = []
+
+        class Client:
+            @async_memoize(ttl=60)
+            async def org(self):
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                if len(calls) == 1:
+                    raise ConnectionError("boom")
+                return len(calls)
+
+        client = Client()
+        results = await asyncio.gather(
+            *(client.org() for _ in range(5)), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ConnectionError)
+                            for r in results))
+        results = await asyncio.gather(*(client.org() for _ in range(5)))
+        self.assertEqual(results, [2] * 5)
+        self.assertEqual(await Client.org.refresh(client), 3)
+        self.assertEqual(await client.org(), 3)
+        self.assertEqual(len(calls), 3)
+
+    async def test_async_memoize_stale(self):
+        """
+        Testing stale-while-revalidate on coroutines
+        """
+        calls = []
+
+        class Client:
+            @async_memoize(ttl=0.1, max_stale=0.2)
+            async def org(self):
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return len(calls)
+
+        client = Client()
+        self.assertEqual(await client.org(), 1)
+        await asyncio.sleep(0.15)
+        self.assertEqual(await client.org(), 1)
+        self.assertEqual(await client.org(), 1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(await client.org(), 2)
+        await asyncio.sleep(0.5)
+        self.assertEqual(await client.org(), 3)
+        self.assertEqual(len(calls), 3)
+
+
+def etag_route(handler):
+    """Stub route answering 304 when the client's ETag matches"""
+    if handler.headers.get("If-None-Match") == '"v1"':
+        return 304, {"ETag": '"v1"'}, b""
+    return 200, {"ETag": '"v1"'}, json.dumps({"login": "google"}).encode()
+
+
+class TestValidatorCache(unittest.TestCase):
+    """
+    Testing conditional requests in utils.get_json
+    """
+    def setUp(self) -> None:
+        """Create a temporary directory for the disk backend"""
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Remove the temporary directory"""
+        self.tmp.cleanup()
+
+    def caches(self):
+        """One cache per backend"""
+        return [MemoryValidatorCache(), DiskValidatorCache(self.tmp.name)]
+
+    def test_revalidation(self) -> None:
+        """
+        Testing that a 304 answer returns the cached body
+        """
+        for cache in self.caches():
+            with StubServer({"/orgs/google": etag_route}) as server:
+                url = server.url("/orgs/google")
+                for _ in range(3):
+                    self.assertEqual(utils.get_json(url, cache=cache),
+                                     {"login": "google"})
+                self.assertEqual(server.last_headers["If-None-Match"],
+                                 '"v1"')
+            self.assertEqual(cache.stats(), {"hits": 2, "misses": 1,
+                                             "revalidations": 2})
+
+    def test_changed_payload(self) -> None:
+        """
+        Testing that a 200 answer to a conditional request replaces the
+        cached entry
+        """
+        cache = MemoryValidatorCache()
+        with StubServer({"/a": etag_route}) as server:
+            url = server.url("/a")
+            utils.get_json(url, cache=cache)
+            server.routes["/a"] = lambda handler: (
+                200, {"ETag": '"v2"'}, b'{"login": "new"}')
+            self.assertEqual(utils.get_json(url, cache=cache),
+                             {"login": "new"})
+        self.assertEqual(cache.stats()["hits"], 0)
+        self.assertEqual(cache.request_headers(url),
+                         {"If-None-Match": '"v2"'})
+
+    def test_no_validators(self) -> None:
+        """
+        Testing that responses without validators are not cached
+        """
+        cache = MemoryValidatorCache()
+        with StubServer({"/a": {"a": 1}}) as server:
+            utils.get_json(server.url("/a"), cache=cache)
+            utils.get_json(server.url("/a"), cache=cache)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_installed_cache(self) -> None:
+        """
+        Testing the module level cache installed with set_validator_cache
+        """
+        cache = MemoryValidatorCache()
+        self.assertIsNone(utils.set_validator_cache(cache))
+        try:
+            with StubServer({"/a": etag_route}) as server:
+                utils.get_json(server.url("/a"))
+                utils.get_json(server.url("/a"))
+        finally:
+            self.assertIs(utils.set_validator_cache(None), cache)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Testing caches.MemoryResponseCache
+    """
+    def test_lru(self) -> None:
+        """
+        Testing LRU eviction and stats
+        """
+        cache = MemoryResponseCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.set("c", 3)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get_or_set("c", lambda: 0), 3)
+        self.assertEqual(cache.stats(), {
+            "size": 2, "hits": 2, "misses": 1, "hit_ratio": 2 / 3,
+            "maxsize": 2, "evictions": 1})
+        cache.clear()
+        self.assertEqual(cache.stats()["size"], 0)
+        self.assertEqual(cache.stats()["hit_ratio"], 0.0)
+
+    def test_ttl(self) -> None:
+        """
+        Testing expiry
+        """
+        cache = MemoryResponseCache(ttl=10)
+        with patch("caches.time.time", return_value=0.0) as clock:
+            cache.set("a", 1)
+            clock.return_value = 9.0
+            self.assertEqual(cache.get("a"), (True, 1))
+            clock.return_value = 10.0
+            self.assertEqual(cache.get("a"), (False, None))
+
+
+class TestSQLiteResponseCache(unittest.TestCase):
+    """
+    Testing caches.SQLiteResponseCache
+    """
+    def setUp(self) -> None:
+        """Create a temporary database path"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name + "/cache.sqlite"
+
+    def tearDown(self) -> None:
+        """Remove the temporary database"""
+        self.tmp.cleanup()
+
+    def test_persistence(self) -> None:
+        """
+        Testing that entries survive reopening the database
+        """
+        cache = SQLiteResponseCache(self.path)
+        cache.set("https://a.io/orgs/google", {"login": "google"})
+        cache.set("https://a.io/repos", utils.PagedList(
+            "https://a.io/repos", fetch=lambda url: ([{"name": "a"}], None)))
+        cache.close()
+        cache = SQLiteResponseCache(self.path)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("https://a.io/orgs/google"),
+                         (True, {"login": "google"}))
+        self.assertEqual(cache.get("https://a.io/repos"),
+                         (True, [{"name": "a"}]))
+        cache.clear()
+        self.assertEqual(cache.get("https://a.io/repos"), (False, None))
+        cache.close()
+
+    def test_expiry(self) -> None:
+        """
+        Testing expiry and purge
+        """
+        cache = SQLiteResponseCache(self.path, ttl=10)
+        with patch("caches.time.time", return_value=0.0) as clock:
+            cache.set("a", 1)
+            clock.return_value = 5.0
+            cache.set("b", 2)
+            clock.return_value = 12.0
+            self.assertEqual(cache.get("a"), (False, None))
+            self.assertEqual(cache.get("b"), (True, 2))
+            self.assertEqual(cache.purge(), 1)
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Testing incremental JSON array parsing
+    """
+    document = json.dumps(
+        [{"name": "repo\u00e9{}".format(i), "license": None}
+         for i in range(20)] + [1234, -5.5e3, "x", None, True, [1, [2]]],
+        indent=1).encode()
+
+    @parameterized.expand([(1,), (2,), (7,), (100,), (100000,)])
+    def test_iter_json_array(self, size: int) -> None:
+        """
+        Testing items split across chunks at every boundary
+        """
+        chunks = [self.document[i:i + size]
+                  for i in range(0, len(self.document), size)]
+        self.assertEqual(list(utils.iter_json_array(chunks)),
+                         json.loads(self.document))
+
+    @parameterized.expand([
+        (["[]"], []),
+        ([" [ ", " ] "], []),
+        (["[1", "2,3]"], [12, 3]),
+    ])
+    def test_iter_json_array_edges(self, chunks, expected) -> None:
+        """
+        Testing empty arrays and str chunks
+        """
+        self.assertEqual(list(utils.iter_json_array(chunks)), expected)
+
+    @parameterized.expand([
+        (["{}"],), (["[1,"],), (["[1 2]"],), (["[1,,2]"],), ([""],),
+    ])
+    def test_iter_json_array_errors(self, chunks) -> None:
+        """
+        Testing malformed or truncated documents
+        """
+        with self.assertRaises(ValueError):
+            list(utils.iter_json_array(chunks))
+
+    def test_lazy_parsing(self) -> None:
+        """
+        Testing that items are yielded before the document ends
+        """
+        def chunks():
+            yield b'[{"name": "a"},'
+            raise AssertionError("read past the first item")
+
+        self.assertEqual(next(utils.iter_json_array(chunks())),
+                         {"name": "a"})
+
+    def test_get_json_stream(self) -> None:
+        """
+        Testing streaming across pages
+        """
+        items = json.loads(self.document)[:20]
+        with StubServer({"/r": paged_route(items)}) as server:
+            self.assertEqual(
+                list(utils.get_json_stream(server.url("/r"), per_page=3)),
+                items)
+        self.assertEqual(server.requests, 7)
+
+
+class TestPagedList(unittest.TestCase):
+    """
+    Testing utils.PagedList pagination
+    """
+    items = [{"name": "repo{}".format(i)} for i in range(25)]
+
+    @parameterized.expand([
+        ("https://a.io/repos", {"per_page": 10},
+         "https://a.io/repos?per_page=10"),
+        ("https://a.io/repos?type=all&per_page=5", {"per_page": 10},
+         "https://a.io/repos?type=all&per_page=10"),
+    ])
+    def test_with_query(self, url: str, params: Dict, expected: str) -> None:
+        """
+        Testing query string updates
+        """
+        self.assertEqual(utils.with_query(url, **params), expected)
+
+    def test_get_json_page(self) -> None:
+        """
+        Testing the next page URL parsed from the Link header
+        """
+        with StubServer({"/r": paged_route(self.items, 10)}) as server:
+            page, next_url = utils.get_json_page(server.url("/r"))
+            self.assertEqual(page, self.items[:10])
+            self.assertEqual(next_url, server.url("/r?page=2"))
+            page, next_url = utils.get_json_page(server.url("/r?page=3"))
+            self.assertEqual(page, self.items[20:])
+            self.assertIsNone(next_url)
+
+    def test_lazy_pages(self) -> None:
+        """
+        Testing that pages are only fetched when needed
+        """
+        with StubServer({"/r": paged_route(self.items)}) as server:
+            repos = utils.PagedList(server.url("/r"), per_page=10)
+            self.assertEqual(repos[3], self.items[3])
+            self.assertEqual(server.requests, 1)
+            self.assertFalse(repos.complete)
+            self.assertEqual(len(repos), 25)
+            self.assertEqual(server.requests, 3)
+            self.assertTrue(repos.complete)
+            self.assertEqual(repos, self.items)
+            self.assertEqual(repos[-1], self.items[-1])
+            self.assertEqual(server.requests, 3)
+
+    def test_iteration(self) -> None:
+        """
+        Testing iteration across pages, with and without prefetch
+        """
+        for prefetch in (False, True):
+            with StubServer({"/r": paged_route(self.items)}) as server:
+                repos = utils.PagedList(server.url("/r"), per_page=4,
+                                        prefetch=prefetch)
+                first = next(iter(repos))
+                self.assertEqual(first, self.items[0])
+                self.assertEqual(list(repos), self.items)
+                self.assertEqual(server.requests, 7)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_failed_page(self, prefetch: bool) -> None:
+        """
+        Testing that a page fetch failing once can be retried
+        """
+        failures = ["p2"]
+
+        def fetch(url: str) -> Tuple[List[int], Optional[str]]:
+            """Fail on the first fetch of p2"""
+            if url in failures:
+                failures.remove(url)
+                raise ConnectionError("boom")
+            return ([1], "p2") if url == "p1" else ([2], None)
+
+        repos = utils.PagedList("p1", prefetch=prefetch, fetch=fetch)
+        with self.assertRaisesRegex(ConnectionError, "boom"):
+            list(repos)
+        self.assertEqual(list(repos), [1, 2])
+        self.assertTrue(repos.complete)
+
+    def test_not_a_list(self) -> None:
+        """
+        Testing that an error payload is not mistaken for a page
+        """
+        repos = utils.PagedList(
+            "http://a.io", fetch=lambda url: ({"message": "Not Found"}, None))
+        with self.assertRaises(TypeError):
+            list(repos)
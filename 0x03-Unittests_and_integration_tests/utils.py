@@ -1,22 +1,95 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import asyncio
+import codecs
+import json
+import math
+import threading
+import time
+import weakref
 import requests
-from functools import wraps
+from array import array
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial, update_wrapper
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from requests.utils import parse_header_links
+from caches import ValidatorCache
+from ratelimit import (
+    PRIORITY_ORG,
+    PRIORITY_PAGE,
+    RateLimitScheduler,
+    is_rate_limited,
+)
+from metrics import RequestMetrics, instrumentation, request_metrics
+from retry import RetryPolicy
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
 
 __all__ = [
+    "AsyncMemoizedMethod",
+    "JSONArrayParser",
+    "MemoizedProperty",
+    "PagedList",
     "access_nested_map",
+    "async_memoize",
+    "compile_path",
+    "extract_columns",
     "get_json",
+    "get_json_page",
+    "get_json_stream",
+    "get_rate_limiter",
+    "get_request_metrics",
+    "get_retry_policy",
+    "get_session",
+    "is_coalescing",
+    "iter_json_array",
+    "make_session",
     "memoize",
+    "set_coalescing",
+    "set_rate_limiter",
+    "set_retry_policy",
+    "set_session",
+    "set_validator_cache",
+    "with_query",
 ]
 
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+STREAM_CHUNK_SIZE = 64 * 1024
+RATE_LIMIT_RETRIES = 5
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_validator_cache: Optional[ValidatorCache] = None
+_rate_limiter: Optional[RateLimitScheduler] = None
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+_retry_policy: Optional[RetryPolicy] = None
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_coalescing = True
+_flights: Dict[Hashable, Future] = {}
+_flights_lock = threading.Lock()
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -40,15 +113,1024 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+_RAISE = object()
+
+
+def compile_path(path: Sequence, default: Any = _RAISE
+                 ) -> Callable[[Mapping], Any]:
+    """Compile a key path into a reusable getter.
+    The getter behaves like `access_nested_map(nested_map, path)` but
+    walks plain dicts with `dict.get` instead of an `isinstance` check
+    against the Mapping ABC, other Mappings falling back to indexing.
+    When `default` is given it is returned instead of raising KeyError.
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"), default=None)
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    >>> license_key({"license": None}) is None
+    True
+    """
+    keys = tuple(path)
+    raises = default is _RAISE
+    missing = object()
+
+    def getter(nested_map: Mapping) -> Any:
+        """Value at the compiled path of `nested_map`"""
+        node = nested_map
+        for key in keys:
+            if type(node) is dict:
+                node = node.get(key, missing)
+            elif isinstance(node, Mapping):
+                try:
+                    node = node[key]
+                except KeyError:
+                    node = missing
+            else:
+                node = missing
+            if node is missing:
+                if raises:
+                    raise KeyError(key)
+                return default
+        return node
+
+    getter.path = keys
+    return getter
+
+
+def _numeric_append(column: array, default: float
+                    ) -> Callable[[Any], None]:
+    """`column.append`, storing `default` for non-numeric values"""
+    append = column.append
+
+    def append_number(value: Any) -> None:
+        """Append value, or default when it is not a number"""
+        try:
+            append(value)
+        except TypeError:
+            append(default)
+    return append_number
+
+
+def extract_columns(payloads: Iterable[Mapping],
+                    paths: Union[Mapping[str, Sequence], Iterable[Sequence]],
+                    default: Any = None, numeric: Iterable[str] = (),
+                    numeric_default: float = math.nan,
+                    as_numpy: bool = False) -> Dict[str, Any]:
+    """Extract several key paths from every payload in one pass.
+    Parameters
+    ----------
+    payloads: Iterable[Mapping]
+        the nested maps, e.g. a repos payload
+    paths: Mapping or Iterable
+        column name -> key path, or key paths named by joining their
+        keys with dots; a string path is a single key
+    default: Any
+        sentinel stored for a missing value
+    numeric: Iterable[str]
+        columns returned as `array("d")` (float64) instead of lists
+    numeric_default: float
+        sentinel of the numeric columns, NaN by default, also stored
+        for null and other non-numeric values
+    as_numpy: bool
+        return numeric columns as NumPy arrays (requires numpy)
+    Example
+    -------
+    >>> extract_columns(repos, [("name",), ("license", "key"), ("forks",)],
+    ...                 numeric=["forks"])
+    {'name': ['truth', ...], 'license.key': ['apache-2.0', ...],
+     'forks': array('d', [12.0, ...])}
+    """
+    if not isinstance(paths, Mapping):
+        paths = {path if isinstance(path, str) else ".".join(map(str, path)):
+                 path for path in paths}
+    paths = {name: (path,) if isinstance(path, str) else path
+             for name, path in paths.items()}
+    numeric = set(numeric)
+    unknown = numeric - set(paths)
+    if unknown:
+        raise KeyError("numeric columns not in paths: {}".format(
+            ", ".join(sorted(unknown))))
+    columns: List[Any] = []
+    appends: List[Tuple[Callable[[Mapping], Any], Callable[[Any], None]]] = []
+    for name, path in paths.items():
+        if name in numeric:
+            column: Any = array("d")
+            append = _numeric_append(column, numeric_default)
+            getter = compile_path(path, numeric_default)
+        else:
+            column = []
+            append = column.append
+            getter = compile_path(path, default)
+        columns.append(column)
+        appends.append((getter, append))
+    for payload in payloads:
+        for getter, append in appends:
+            append(getter(payload))
+
+    result = dict(zip(paths, columns))
+    if as_numpy:
+        import numpy
+        for name in numeric:
+            result[name] = numpy.frombuffer(result[name], dtype=numpy.float64)
+    return result
+
+
+def make_session(pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE,
+                 pool_block: bool = False) -> requests.Session:
+    """Build a keep-alive session with a tuned connection pool.
+    Parameters
+    ----------
+    pool_connections: int
+        number of per-host pools to keep
+    pool_maxsize: int
+        connections kept alive per host, should cover the number of
+        threads sharing the session
+    pool_block: bool
+        wait for a free connection instead of opening a throwaway one
+        when the pool is exhausted
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def set_session(
+        session: Optional[requests.Session]) -> Optional[requests.Session]:
+    """Replace the shared session and return the previous one.
+    Passing None drops the current session so the next call to
+    `get_session` builds a fresh default one.
+    """
+    global _session
+    with _session_lock:
+        previous, _session = _session, session
+    return previous
+
+
+def set_validator_cache(
+        cache: Optional[ValidatorCache]) -> Optional[ValidatorCache]:
+    """Install the validator cache used by `get_json` and return the
+    previous one. None disables conditional requests.
+    """
+    global _validator_cache
+    previous, _validator_cache = _validator_cache, cache
+    return previous
+
+
+def get_rate_limiter() -> Optional[RateLimitScheduler]:
+    """Return the installed rate limit scheduler, if any"""
+    return _rate_limiter
+
+
+def set_rate_limiter(
+        limiter: Optional[RateLimitScheduler]
+        ) -> Optional[RateLimitScheduler]:
+    """Install the rate limit scheduler used by `get_json` and return
+    the previous one. None sends requests unthrottled.
+    """
+    global _rate_limiter
+    previous, _rate_limiter = _rate_limiter, limiter
+    return previous
+
+
+def get_retry_policy() -> Optional[RetryPolicy]:
+    """Return the installed retry policy, if any"""
+    return _retry_policy
+
+
+def set_retry_policy(
+        policy: Optional[RetryPolicy]) -> Optional[RetryPolicy]:
+    """Install the retry policy used by `get_json` and return the
+    previous one. None sends every request once, without timeout.
+    """
+    global _retry_policy
+    previous, _retry_policy = _retry_policy, policy
+    return previous
+
+
+def _send_limited(session: requests.Session, url: str, priority: int,
+                  kwargs: Dict[str, Any]) -> requests.Response:
+    """GET `url`, through the rate limit scheduler when one is installed.
+    A rate limited answer pauses the scheduler and is retried up to
+    RATE_LIMIT_RETRIES times before being returned.
+    """
+    limiter = _rate_limiter
+    if limiter is None:
+        return session.get(url, **kwargs)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(priority)
+        response = session.get(url, **kwargs)
+        limiter.update(response.headers)
+        if (attempt == RATE_LIMIT_RETRIES
+                or not is_rate_limited(response.status_code,
+                                       response.headers)):
+            break
+        response.close()
+        limiter.backoff(attempt, response.headers.get("Retry-After"))
+    return response
+
+
+def _send_timed(session: requests.Session, url: str, priority: int,
+                kwargs: Dict[str, Any],
+                metrics: RequestMetrics) -> requests.Response:
+    """`_send_limited`, recording the attempt in `metrics`"""
+    metrics.incr("requests")
+    start = time.perf_counter()
+    try:
+        response = _send_limited(session, url, priority, kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        metrics.incr("failures")
+        raise
+    metrics.latency.observe(time.perf_counter() - start)
+    return response
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Return the executor running hedged requests"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _session_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=POOL_MAXSIZE, thread_name_prefix="hedge")
+    return _hedge_executor
+
+
+def _close_response(future: Future) -> None:
+    """Release the connection of a hedged request that lost"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _send_hedged(session: requests.Session, url: str, priority: int,
+                 kwargs: Dict[str, Any],
+                 policy: RetryPolicy) -> requests.Response:
+    """Send one attempt, duplicated when it is slower than the policy's
+    hedge delay. The first successful answer wins; the other one is
+    closed when it arrives.
+    """
+    metrics = policy.metrics
+    delay = policy.hedge_delay()
+    if delay is None:
+        return _send_timed(session, url, priority, kwargs, metrics)
+    executor = _get_hedge_executor()
+    send = partial(_send_timed, session, url, priority, kwargs, metrics)
+    primary = executor.submit(send)
+    if wait([primary], timeout=delay).done:
+        return primary.result()
+    metrics.incr("hedges")
+    hedge = executor.submit(send)
+    done = wait([primary, hedge], return_when=FIRST_COMPLETED).done
+    winner, loser = (primary, hedge) if primary in done else (hedge, primary)
+    if winner.exception() is not None:
+        winner, loser = loser, winner
+    else:
+        loser.add_done_callback(_close_response)
+    response = winner.result()
+    if winner is hedge:
+        metrics.incr("hedge_wins")
+    return response
+
+
+def _send(session: requests.Session, url: str, headers: Dict[str, str],
+          priority: int, **kwargs: Any) -> requests.Response:
+    """`_send_retrying`, timed when instrumentation is enabled"""
+    if not instrumentation.enabled:
+        return _send_retrying(session, url, headers, priority, **kwargs)
+    start = time.perf_counter_ns()
+    response = _send_retrying(session, url, headers, priority, **kwargs)
+    instrumentation.observe_ns("request_latency_ns",
+                               time.perf_counter_ns() - start)
+    return response
+
+
+def _send_retrying(session: requests.Session, url: str,
+                   headers: Dict[str, str], priority: int,
+                   **kwargs: Any) -> requests.Response:
+    """GET `url` under the installed retry policy and rate limiter.
+    Without a retry policy the request is sent once; with one, 5xx
+    answers, connection errors and timeouts are retried after a
+    backoff and slow requests are hedged.
+    """
+    if headers:
+        kwargs["headers"] = headers
+    policy = _retry_policy
+    if policy is None:
+        return _send_limited(session, url, priority, kwargs)
+    if policy.timeout is not None:
+        kwargs["timeout"] = policy.timeout
+    attempt = 0
+    while True:
+        try:
+            response = _send_hedged(session, url, priority, kwargs, policy)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= policy.retries:
+                raise
+        else:
+            if (attempt >= policy.retries
+                    or not policy.should_retry(response.status_code)):
+                return response
+            response.close()
+        time.sleep(policy.delay(attempt))
+        attempt += 1
+        policy.metrics.incr("retries")
+
+
+def is_coalescing() -> bool:
+    """True when concurrent fetches of one URL share a request"""
+    return _coalescing
+
+
+def set_coalescing(enabled: bool) -> bool:
+    """Enable or disable request coalescing and return the previous
+    setting.
+    """
+    global _coalescing
+    previous, _coalescing = _coalescing, enabled
+    return previous
+
+
+def get_request_metrics() -> RequestMetrics:
+    """Return the metrics of the installed retry policy, or the
+    module-level `metrics.request_metrics` without one"""
+    policy = _retry_policy
+    return request_metrics if policy is None else policy.metrics
+
+
+def _coalesce(key: Hashable, fetch: Callable[[], Any]) -> Any:
+    """Return `fetch()`, or wait for the result of the identical fetch
+    already in flight in another thread"""
+    if not _coalescing:
+        return fetch()
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = Future()
+            leader = True
+        else:
+            leader = False
+    if not leader:
+        get_request_metrics().incr("coalesced")
+        return flight.result()
+    try:
+        result = fetch()
+    except BaseException as error:
+        with _flights_lock:
+            del _flights[key]
+        flight.set_exception(error)
+        raise
+    with _flights_lock:
+        del _flights[key]
+    flight.set_result(result)
+    return result
+
+
+def _fetch(url: str, session: Optional[requests.Session],
+           cache: Optional[ValidatorCache],
+           priority: int) -> Tuple[Any, Optional[str]]:
+    """Fetch `url` and return its parsed body and `Link` header.
+    Concurrent fetches of `url` with the same session and cache are
+    coalesced into one request.
+    """
+    return _coalesce((url, session, cache),
+                     partial(_fetch_once, url, session, cache, priority))
+
+
+def _decode(response: requests.Response) -> Any:
+    """Parsed JSON body of `response`, with its size and decode time
+    recorded when instrumentation is enabled"""
+    if not instrumentation.enabled:
+        return response.json()
+    instrumentation.count("bytes_received", len(response.content))
+    start = time.perf_counter_ns()
+    body = response.json()
+    instrumentation.observe_ns("json_decode_ns",
+                               time.perf_counter_ns() - start)
+    return body
+
+
+def _counted(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Pass `chunks` through, counting their bytes"""
+    for chunk in chunks:
+        instrumentation.count("bytes_received", len(chunk))
+        yield chunk
+
+
+def _fetch_once(url: str, session: Optional[requests.Session],
+                cache: Optional[ValidatorCache],
+                priority: int) -> Tuple[Any, Optional[str]]:
+    """Send the request of `_fetch`"""
+    session = session or get_session()
+    cache = _validator_cache if cache is None else cache
+    if cache is None:
+        response = _send(session, url, {}, priority)
+        return _decode(response), response.headers.get("Link")
+
+    headers = cache.request_headers(url)
+    response = _send(session, url, headers, priority)
+    if headers and response.status_code == 304:
+        entry = cache.not_modified(url)
+        return entry["body"], response.headers.get("Link", entry["link"])
+    body = _decode(response)
+    cache.store(url, response.headers, body)
+    return body, response.headers.get("Link")
+
+
+def get_json(url: str, session: Optional[requests.Session] = None,
+             cache: Optional[ValidatorCache] = None,
+             priority: int = PRIORITY_ORG) -> Dict:
     """Get JSON from remote URL.
+    Uses `session` when given, the shared pooled session otherwise.
+    With a validator cache (`cache`, or the one installed with
+    `set_validator_cache`) the request carries `If-None-Match` /
+    `If-Modified-Since` and a 304 answer returns the cached body.
+    With a rate limiter installed (`set_rate_limiter`) the request
+    waits for its turn by `priority`. With a retry policy installed
+    (`set_retry_policy`) failed requests are retried and slow ones
+    hedged. Threads fetching the same URL at the same time share one
+    request and its parsed body, which must not be mutated.
     """
-    response = requests.get(url)
-    return response.json()
+    return _fetch(url, session, cache, priority)[0]
 
 
-def memoize(fn: Callable) -> Callable:
+def get_json_page(url: str, session: Optional[requests.Session] = None,
+                  cache: Optional[ValidatorCache] = None,
+                  priority: int = PRIORITY_PAGE
+                  ) -> Tuple[Any, Optional[str]]:
+    """Get one page of a paginated JSON resource.
+    Same as `get_json` but also returns the URL of the `rel="next"`
+    page from the `Link` header, or None on the last page. Pages are
+    scheduled after org lookups by default.
+    """
+    body, link = _fetch(url, session, cache, priority)
+    return body, _next_link(link)
+
+
+def _next_link(link: Optional[str]) -> Optional[str]:
+    """URL of the `rel="next"` target of a `Link` header"""
+    for target in parse_header_links(link or ""):
+        if target.get("rel") == "next":
+            return target["url"]
+    return None
+
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(buffer: str, position: int) -> int:
+    """Index of the first non-whitespace character from `position`"""
+    while position < len(buffer) and buffer[position] in " \t\n\r":
+        position += 1
+    return position
+
+
+class JSONArrayParser:
+    """Push parser for a top-level JSON array.
+    `feed` takes the document chunk by chunk (bytes or str) and returns
+    the items completed so far; only the item in progress is buffered.
+    An item is only returned once its separator has arrived, since a
+    number may continue in the next chunk.
+    """
+
+    def __init__(self) -> None:
+        """Init method of JSONArrayParser"""
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._buffer = ""
+        self._position = 0
+        self._expect = "["
+        self._done = False
+        self.complete = False
+
+    def feed(self, chunk: Union[bytes, str]) -> List[Any]:
+        """Add a chunk and return the items it completes"""
+        if isinstance(chunk, bytes):
+            chunk = self._decode(chunk)
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return self._parse()
+
+    def close(self) -> List[Any]:
+        """Signal the end of the document and return the last items"""
+        self._done = True
+        items = self.feed(self._decode(b"", final=True))
+        if not self.complete:
+            raise ValueError("unexpected end of JSON array")
+        return items
+
+    def _parse(self) -> List[Any]:
+        """Parse the complete items of the buffer"""
+        buffer, position, items = self._buffer, self._position, []
+        while not self.complete:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                break
+            char, expect = buffer[position], self._expect
+            if expect == "[":
+                if char != "[":
+                    raise ValueError("expected a JSON array, got {!r}"
+                                     .format(buffer[position:position + 20]))
+                position += 1
+                self._expect = "item"
+            elif expect == "," and char in ",]":
+                position += 1
+                self.complete = char == "]"
+                self._expect = "value"
+            elif expect == "item" and char == "]":
+                position += 1
+                self.complete = True
+            elif expect in ("item", "value"):
+                try:
+                    item, end = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if self._done:
+                        raise
+                    break
+                after = _skip_whitespace(buffer, end)
+                if not self._done and (after == len(buffer)
+                                       or buffer[after] not in ",]"):
+                    break
+                position = end
+                self._expect = ","
+                items.append(item)
+            else:
+                raise ValueError("malformed JSON array at {!r}".format(
+                    buffer[position:position + 20]))
+        self._position = position
+        return items
+
+
+def iter_json_array(chunks: Iterable[Union[bytes, str]]) -> Iterator[Any]:
+    """Parse a top-level JSON array incrementally, yielding its items.
+    Only the item being parsed is buffered, so memory stays bounded by
+    the largest item rather than the whole document.
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"name": "a"}, {"na', b'me": "b"}]']))
+    [{'name': 'a'}, {'name': 'b'}]
+    """
+    parser = JSONArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.complete:
+            return
+    yield from parser.close()
+
+
+def get_json_stream(url: str, session: Optional[requests.Session] = None,
+                    per_page: Optional[int] = None,
+                    priority: int = PRIORITY_PAGE) -> Iterator[Any]:
+    """Stream the items of a JSON array resource, following
+    `Link: rel="next"` pages.
+    Items are parsed from the response body as it downloads and are not
+    kept, so memory stays bounded regardless of the number of items.
+    The validator cache is not used.
+    """
+    session = session or get_session()
+    if per_page is not None:
+        url = with_query(url, per_page=per_page)
+    while url is not None:
+        with _send(session, url, {}, priority, stream=True) as response:
+            url = _next_link(response.headers.get("Link"))
+            chunks = response.iter_content(STREAM_CHUNK_SIZE)
+            if instrumentation.enabled:
+                chunks = _counted(chunks)
+            yield from iter_json_array(chunks)
+
+
+def with_query(url: str, **params: Any) -> str:
+    """Return `url` with `params` set in its query string.
+    Example
+    -------
+    >>> with_query("https://a.io/repos?type=all", per_page=100)
+    'https://a.io/repos?type=all&per_page=100'
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update((key, str(value)) for key, value in params.items())
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    """Return the executor running page prefetches"""
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        with _session_lock:
+            if _prefetch_executor is None:
+                _prefetch_executor = ThreadPoolExecutor(
+                    max_workers=POOL_CONNECTIONS,
+                    thread_name_prefix="prefetch")
+    return _prefetch_executor
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    """Return the executor running stale-while-revalidate refreshes"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _session_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=POOL_CONNECTIONS,
+                    thread_name_prefix="refresh")
+    return _refresh_executor
+
+
+class PagedList(Sequence):
+    """Lazily extended sequence over a `Link`-paginated JSON array.
+    Pages are fetched on demand while iterating or indexing, so the
+    first items are usable before the last page arrives. `len()`,
+    negative indexes and slices load every page.
+    Parameters
+    ----------
+    url: str
+        URL of the first page
+    per_page: int
+        page size requested with the `per_page` query parameter
+    prefetch: bool
+        fetch page N+1 in the background as soon as page N arrives
+    fetch: Callable
+        page fetcher returning (items, next_url), `get_json_page` by
+        default
+    transform: Callable
+        applied to each item as its page arrives, e.g. to project it
+        into a compact record
+    Example
+    -------
+    >>> repos = PagedList("https://api.github.com/orgs/google/repos",
+    ...                   per_page=100)
+    >>> repos[0]["name"]  # only the first page is downloaded
+    'episodes.dart'
+    """
+
+    def __init__(self, url: str, per_page: Optional[int] = None,
+                 prefetch: bool = False,
+                 fetch: Callable[[str], Tuple[Any, Optional[str]]] = None,
+                 transform: Optional[Callable[[Any], Any]] = None) -> None:
+        """Init method of PagedList"""
+        if per_page is not None:
+            url = with_query(url, per_page=per_page)
+        self._fetch = fetch or get_json_page
+        self._prefetch = prefetch
+        self._transform = transform
+        self._items: List[Any] = []
+        self._next_url: Optional[str] = url
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self) -> bool:
+        """True once the last page has been loaded"""
+        return self._next_url is None
+
+    def _load_next_page(self) -> bool:
+        """Append the next page to the loaded items.
+        Returns False when there is no page left.
+        """
+        with self._lock:
+            if self._next_url is None:
+                return False
+            pending, self._pending = self._pending, None
+            if pending is not None:
+                # A failed prefetch raises once, the next load retries
+                page, next_url = pending.result()
+            else:
+                page, next_url = self._fetch(self._next_url)
+            if not isinstance(page, list):
+                raise TypeError("expected a JSON array page, got {!r}"
+                                .format(page))
+            if self._transform is not None:
+                page = map(self._transform, page)
+            self._items.extend(page)
+            self._next_url = next_url
+            if self._prefetch and next_url is not None:
+                self._pending = _get_prefetch_executor().submit(
+                    self._fetch, next_url)
+            return True
+
+    def _load_until(self, size: Optional[int] = None) -> None:
+        """Load pages until `size` items are loaded, or all pages"""
+        while size is None or len(self._items) < size:
+            if not self._load_next_page():
+                return
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over the items, fetching pages as needed"""
+        index = 0
+        while True:
+            while index < len(self._items):
+                yield self._items[index]
+                index += 1
+            if not self._load_next_page():
+                return
+
+    def __getitem__(self, index):
+        """Item or slice, loading only the pages needed"""
+        if isinstance(index, int) and index >= 0:
+            self._load_until(index + 1)
+        else:
+            self._load_until()
+        return self._items[index]
+
+    def __len__(self) -> int:
+        """Total number of items, loads every page"""
+        self._load_until()
+        return len(self._items)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare items with another sequence"""
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        """Show loaded items and whether more pages follow"""
+        return "<PagedList {!r}{}>".format(
+            self._items, "" if self.complete else " ...")
+
+
+class MemoizedProperty:
+    """Read-only property computing its value once per instance.
+    The value is stored on the instance as `_<name>` and recomputed
+    once older than `ttl` seconds. With `maxsize`, only the values of
+    the `maxsize` most recently used instances are kept: the value of
+    the least recently used one is dropped when a new one is stored.
+    Computation is single-flight: when several threads miss at once,
+    one calls the method and the others wait for its result. A failure
+    is raised in every waiter and is not cached.
+    With `max_stale`, an expired value is still returned for up to
+    `max_stale` seconds past its expiry (stale-while-revalidate) while
+    a background thread recomputes it; a failed refresh keeps the
+    stale value. Past `max_stale`, access blocks on the recomputation.
+    Built by `memoize`; the hooks are reached through the class:
+    >>> GithubOrgClient.org.invalidate(client)  # next access refetches
+    >>> GithubOrgClient.org.refresh(client)     # refetch now
+    """
+
+    def __init__(self, fn: Callable, ttl: Optional[float] = None,
+                 maxsize: Optional[int] = None,
+                 max_stale: Optional[float] = None) -> None:
+        """Init method of MemoizedProperty"""
+        if max_stale is not None and ttl is None:
+            raise ValueError("max_stale requires a ttl")
+        update_wrapper(self, fn)
+        self.fn = fn
+        self.attr_name = "_{}".format(fn.__name__)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_stale = max_stale
+        self._lru: "OrderedDict[int, weakref.ref]" = OrderedDict()
+        self._flights: Dict[int, Any] = {}
+        self._lock = threading.RLock()
+
+    def _cached(self, obj: Any) -> Tuple[bool, Any]:
+        """(True, value) if `obj` holds an unexpired value"""
+        entry = getattr(obj, self.attr_name, None)
+        if entry is not None and (entry[1] is None
+                                  or entry[1] > time.monotonic()):
+            self._touch(obj)
+            return True, entry[0]
+        return False, None
+
+    def _stale(self, obj: Any) -> Tuple[bool, Any]:
+        """(True, value) if `obj` holds an expired value that may be
+        served while it is recomputed"""
+        if self.max_stale is None:
+            return False, None
+        entry = getattr(obj, self.attr_name, None)
+        if (entry is not None
+                and entry[1] + self.max_stale > time.monotonic()):
+            self._touch(obj)
+            return True, entry[0]
+        return False, None
+
+    def _store(self, obj: Any, value: Any) -> None:
+        """Store `value` on `obj`"""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        setattr(obj, self.attr_name, (value, expires))
+        self._touch(obj)
+
+    def __get__(self, obj: Any, objtype: type = None) -> Any:
+        """Cached value, computed on first access or after expiry"""
+        if obj is None:
+            return self
+        found, value = self._cached(obj)
+        if found:
+            if instrumentation.enabled:
+                self._count("memoize_hits")
+            return value
+        found, value = self._stale(obj)
+        if found:
+            if instrumentation.enabled:
+                self._count("memoize_stale")
+            self._revalidate(obj)
+            return value
+        if instrumentation.enabled:
+            self._count("memoize_misses")
+        return self._compute(obj)
+
+    def _count(self, name: str) -> None:
+        """Count a lookup of this method"""
+        instrumentation.count(name, method=self.__qualname__)
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        """Memoized values are read-only"""
+        raise AttributeError("can't set attribute")
+
+    def _compute(self, obj: Any, force: bool = False) -> Any:
+        """Compute, store and return the value for `obj`, or wait for
+        the computation already in flight"""
+        key = id(obj)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                found, value = (False, None) if force else self._cached(obj)
+                if found:
+                    return value
+                flight = self._flights[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return flight.result()
+        return self._lead(obj, key, flight)
+
+    def _revalidate(self, obj: Any) -> None:
+        """Recompute the value of `obj` in the background, unless a
+        computation is already in flight"""
+        key = id(obj)
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = Future()
+        _get_refresh_executor().submit(self._lead, obj, key, flight)
+
+    def _lead(self, obj: Any, key: int, flight: Future) -> Any:
+        """Compute and store the value of `obj`, settling `flight`"""
+        try:
+            value = self.fn(obj)
+            self._store(obj, value)
+        except BaseException as error:
+            with self._lock:
+                del self._flights[key]
+            flight.set_exception(error)
+            raise
+        with self._lock:
+            del self._flights[key]
+        flight.set_result(value)
+        return value
+
+    def _touch(self, obj: Any) -> None:
+        """Mark `obj` as most recently used, evicting past maxsize"""
+        if self.maxsize is None:
+            return
+        key = id(obj)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return
+            self._lru[key] = weakref.ref(obj, self._forget(key))
+            while len(self._lru) > self.maxsize:
+                evicted = self._lru.popitem(last=False)[1]()
+                if evicted is not None:
+                    self._discard(evicted)
+
+    def _forget(self, key: int) -> Callable[[weakref.ref], None]:
+        """Weakref callback dropping a collected instance"""
+        def callback(ref: weakref.ref) -> None:
+            with self._lock:
+                if self._lru.get(key) is ref:
+                    del self._lru[key]
+        return callback
+
+    def _discard(self, obj: Any) -> None:
+        """Remove the stored value from `obj`"""
+        try:
+            delattr(obj, self.attr_name)
+        except AttributeError:
+            pass
+
+    def invalidate(self, obj: Any) -> None:
+        """Drop the cached value of `obj`"""
+        self._discard(obj)
+        with self._lock:
+            self._lru.pop(id(obj), None)
+
+    def refresh(self, obj: Any) -> Any:
+        """Recompute and return the value of `obj`"""
+        self.invalidate(obj)
+        return self._compute(obj, force=True)
+
+    def __len__(self) -> int:
+        """Number of instances tracked for LRU eviction"""
+        return len(self._lru)
+
+
+class AsyncMemoizedMethod(MemoizedProperty):
+    """Coroutine method counterpart of `MemoizedProperty`.
+    `await obj.method()` returns the cached value; concurrent awaiters
+    of a missing value share one task, which is shielded so that a
+    cancelled awaiter does not cancel it for the others. Stale values
+    are refreshed by a background task. `refresh` returns an
+    awaitable.
+    """
+
+    def __get__(self, obj: Any, objtype: type = None) -> Any:
+        """Bound coroutine function returning the cached value"""
+        if obj is None:
+            return self
+        return partial(self._get, obj)
+
+    async def _get(self, obj: Any, force: bool = False) -> Any:
+        """Cached value, computed on first await or after expiry"""
+        if not force:
+            found, value = self._cached(obj)
+            if found:
+                if instrumentation.enabled:
+                    self._count("memoize_hits")
+                return value
+            found, value = self._stale(obj)
+            if found:
+                if instrumentation.enabled:
+                    self._count("memoize_stale")
+                self._revalidate(obj)
+                return value
+            if instrumentation.enabled:
+                self._count("memoize_misses")
+        return await asyncio.shield(self._start(obj))
+
+    def _start(self, obj: Any) -> "asyncio.Future":
+        """Task computing the value of `obj`, started unless one is
+        already in flight"""
+        key = id(obj)
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(
+                self._run(obj, key))
+        return task
+
+    def _revalidate(self, obj: Any) -> None:
+        """Recompute the value of `obj` in a background task"""
+        # a failed refresh nobody awaits keeps the stale value quietly
+        self._start(obj).add_done_callback(
+            lambda task: task.cancelled() or task.exception())
+
+    async def _run(self, obj: Any, key: int) -> Any:
+        """Compute and store the value of `obj`"""
+        try:
+            value = await self.fn(obj)
+            self._store(obj, value)
+        finally:
+            del self._flights[key]
+        return value
+
+    def refresh(self, obj: Any) -> Any:
+        """Awaitable recomputing the value of `obj`"""
+        self.invalidate(obj)
+        return self._get(obj, force=True)
+
+
+def async_memoize(fn: Callable = None, *, ttl: Optional[float] = None,
+                  maxsize: Optional[int] = None,
+                  max_stale: Optional[float] = None) -> Any:
+    """Decorator to memoize a coroutine method, see `memoize`.
+    Example
+    -------
+    class MyClient:
+        @async_memoize(ttl=60)
+        async def org(self):
+            return await get_json_async(self.url)
+    >>> await MyClient().org()
+    """
+    if fn is None:
+        return lambda fn: AsyncMemoizedMethod(fn, ttl, maxsize, max_stale)
+    return AsyncMemoizedMethod(fn, ttl, maxsize, max_stale)
+
+
+def memoize(fn: Callable = None, *, ttl: Optional[float] = None,
+            maxsize: Optional[int] = None,
+            max_stale: Optional[float] = None) -> Any:
     """Decorator to memoize a method.
+    Used bare or with `ttl` (seconds before the value is recomputed),
+    `maxsize` (values kept across all instances, least recently used
+    dropped first) and `max_stale` (seconds an expired value is still
+    served while it is refreshed in the background), see
+    `MemoizedProperty`.
     Example
     -------
     class MyClass:
@@ -62,14 +1144,11 @@ def memoize(fn: Callable) -> Callable:
     42
     >>> my_object.a_method
     42
+    class MyClient:
+        @memoize(ttl=60, maxsize=1000, max_stale=30)
+        def org(self):
+            ...
     """
-    attr_name = "_{}".format(fn.__name__)
-
-    @wraps(fn)
-    def memoized(self):
-        """"memoized wraps"""
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
-
-    return property(memoized)
+    if fn is None:
+        return lambda fn: MemoizedProperty(fn, ttl, maxsize, max_stale)
+    return MemoizedProperty(fn, ttl, maxsize, max_stale)